@@ -1,7 +1,23 @@
 from django.contrib import admin
-from .models import User, Listing, Bid, Comment
+from .closing import close_listing
+from .models import User, Listing, Bid, Comment, CategoryStats, Notification, BidPriceBucket
+
+
+class ListingAdmin(admin.ModelAdmin):
+    # Listing.save leaves these to bidding and closing; close through the action
+    readonly_fields = ("current_price", "highest_bidder", "closed", "winner", "version")
+    actions = ["close_listings"]
+
+    @admin.action(description="Close selected listings")
+    def close_listings(self, request, queryset):
+        for listing_id in queryset.filter(closed=False).values_list("pk", flat=True):
+            close_listing(listing_id)
+
 
 admin.site.register(User)
-admin.site.register(Listing)
+admin.site.register(Listing, ListingAdmin)
 admin.site.register(Bid)
 admin.site.register(Comment)
+admin.site.register(CategoryStats)
+admin.site.register(Notification)
+admin.site.register(BidPriceBucket)
@@ -0,0 +1,75 @@
+"""
+Bid placement.
+
+A bid is accepted by a single conditional UPDATE on the listing:
+
+    UPDATE listing SET current_price = amount, highest_bidder = user, version = version + 1
+    WHERE id = ? AND NOT closed AND (ends_at IS NULL OR ends_at > now)
+      AND current_price < amount
+
+The database applies the check and the write atomically, so two
+concurrent bids can never both beat the same price, and no bids need to
+be read or sorted. The Bid row is inserted and the price history updated
+in the same transaction, and the listing's category stats are refreshed,
+a live "bid" event published and watchers notified once it commits.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import stats
+from .events import publish_listing_event
+from .history import record_bid
+from .models import Bid, Listing, Notification
+from .notifications import notify
+
+CENT = Decimal("0.01")
+MAX_AMOUNT = Decimal("99999999.99")  # Bid.amount has max_digits=10, decimal_places=2
+
+BidResult = namedtuple("BidResult", ["accepted", "bid", "message"])
+
+
+def parse_amount(raw):
+    """
+    Converts user input to a Decimal amount in whole cents, or None if
+    it isn't a valid bid amount.
+    """
+    try:
+        amount = Decimal(str(raw).strip())
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT or amount != amount.quantize(CENT):
+        return None
+    return amount.quantize(CENT)
+
+
+def place_bid(listing_id, user, amount):
+    """
+    Places a bid of `amount` (a Decimal) on a listing and returns a BidResult.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        accepted = Listing.objects.filter(
+            Q(ends_at__isnull=True) | Q(ends_at__gt=now),
+            pk=listing_id, closed=False, current_price__lt=amount,
+        ).update(current_price=amount, highest_bidder=user, version=F("version") + 1)
+        if accepted:
+            bid = Bid.objects.create(user=user, amount=amount, listing_id=listing_id)
+            record_bid(bid)
+            stats.bid_placed(bid)
+            publish_listing_event(listing_id, "bid", {"amount": str(amount), "bidder": user.username})
+            notify(Notification.OUTBID, listing_id, actor_id=user.id, amount=amount)
+            return BidResult(True, bid, "")
+
+    listing = Listing.objects.filter(pk=listing_id).values("closed", "current_price", "ends_at").first()
+    if listing is None:
+        return BidResult(False, None, "This listing does not exist.")
+    if listing["closed"]:
+        return BidResult(False, None, "This auction is closed.")
+    if listing["ends_at"] is not None and listing["ends_at"] <= now:
+        return BidResult(False, None, "This auction has ended.")
+    return BidResult(False, None,
+                     f"Your bid must be higher than the current highest bid (${listing['current_price']}).")
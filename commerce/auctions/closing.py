@@ -0,0 +1,78 @@
+"""
+Closing auctions.
+
+A listing is closed by one UPDATE that also records the winner from the
+denormalized highest_bidder, so a bid can't slip in between reading the
+winner and closing. place_bid refuses bids past ends_at, and the expiry
+sweep closes due listings in batches of bounded size.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .events import publish_listing_event
+from .models import Listing, Notification
+from .notifications import notify
+
+BATCH_SIZE = 500
+
+
+def _closed(listing_ids):
+    for listing_id in listing_ids:
+        publish_listing_event(listing_id, "closed", {})
+        notify(Notification.ENDED, listing_id)
+
+
+def _close(listing_ids):
+    """
+    Closes the listings among `listing_ids` that are still open in one
+    UPDATE and returns the ids it closed. RETURNING (SQLite 3.35+,
+    PostgreSQL) reports exactly those rows, leaving out any that were
+    closed elsewhere after the ids were read.
+    """
+    qn = connection.ops.quote_name
+    closed, winner, highest_bidder, version, pk = (
+        qn(Listing._meta.get_field(name).column)
+        for name in ("closed", "winner", "highest_bidder", "version", "id"))
+    sql = (f"UPDATE {qn(Listing._meta.db_table)} "
+           f"SET {closed} = %s, {winner} = {highest_bidder}, {version} = {version} + 1 "
+           f"WHERE {pk} IN ({', '.join(['%s'] * len(listing_ids))}) AND {closed} = %s "
+           f"RETURNING {pk}")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [True, *listing_ids, False])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def close_listing(listing_id):
+    """
+    Closes an open listing. Returns False if it was already closed.
+    """
+    with transaction.atomic():
+        closed = Listing.objects.filter(pk=listing_id, closed=False).update(
+            closed=True, winner=F("highest_bidder"), version=F("version") + 1)
+        if closed:
+            stats.listing_changed(listing_id)
+            _closed([listing_id])
+    return bool(closed)
+
+
+def close_expired(now=None, batch_size=BATCH_SIZE):
+    """
+    Closes every open listing whose end time has passed and returns how
+    many were closed. Each batch reads at most `batch_size` due ids from
+    the partial index on open listings' ends_at and closes them in one
+    UPDATE.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Listing.objects.filter(closed=False, ends_at__lte=now)
+                       .order_by("ends_at").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return total
+            closed = _close(ids)
+            stats.listings_changed(closed)
+            _closed(closed)
+        total += len(closed)
@@ -0,0 +1,127 @@
+"""
+Live listing events.
+
+Bids, comments and closes on a listing are published to the channel
+"listing:<id>" once their transaction commits, and the listing page
+follows them over Server-Sent Events (views.listing_events) instead of
+reloading.
+
+The broker is pluggable through the AUCTIONS_EVENT_BACKEND setting (a
+dotted path to a class). It must provide:
+
+    publish(channel, event)  -- event is a JSON-serializable dict
+    subscribe(channel)       -- returns an object with get(timeout),
+                                returning the next event or None, and close()
+
+The default, InProcessBroker, fans events out to subscribers in the same
+process. With several worker processes, use a backend built on a shared
+pub/sub service such as Redis so every process sees every event.
+"""
+import itertools
+import queue
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = "auctions.events.InProcessBroker"
+
+
+class Subscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        # A subscriber that stops reading loses its oldest events rather
+        # than blocking the publisher or growing without bound
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBroker:
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.channels = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def publish(self, channel, event):
+        event = dict(event, id=next(self.ids))
+        with self.lock:
+            subscribers = list(self.channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.maxsize)
+        with self.lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[subscription.channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, "AUCTIONS_EVENT_BACKEND", DEFAULT_BACKEND))()
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "AUCTIONS_EVENT_BACKEND":
+        with _broker_lock:
+            _broker = None
+
+
+def listing_channel(listing_id):
+    return f"listing:{listing_id}"
+
+
+def publish_listing_event(listing_id, type, data):
+    """
+    Publishes an event for a listing when the current transaction commits.
+    """
+    event = {"type": type, "data": data}
+    transaction.on_commit(lambda: get_broker().publish(listing_channel(listing_id), event))
@@ -1,14 +1,37 @@
 from django import forms
+from django.utils import timezone
+
 from .models import Listing
 
 class CreateListingForm(forms.ModelForm):
     class Meta:
         model = Listing
-        fields = ["title", "description", "starting_bid", "image_url", "category"]
+        fields = ["title", "description", "starting_bid", "image_url", "category", "ends_at"]
         widgets = {
             "title": forms.TextInput(attrs={"class": "form-control"}),
             "description": forms.Textarea(attrs={"class": "form-control", "rows": 4}),
             "starting_bid": forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}),
             "image_url": forms.URLInput(attrs={"class": "form-control"}),
             "category": forms.Select(attrs={"class": "form-select"}),
+            "ends_at": forms.DateTimeInput(attrs={"class": "form-control", "type": "datetime-local"},
+                                           format="%Y-%m-%dT%H:%M"),
         }
+
+    def clean_ends_at(self):
+        ends_at = self.cleaned_data["ends_at"]
+        if ends_at is not None and ends_at <= timezone.now():
+            raise forms.ValidationError("The end time must be in the future.")
+        return ends_at
+
+
+class SearchForm(forms.Form):
+    STATUS_CHOICES = [("", "Any"), ("open", "Open"), ("closed", "Closed")]
+
+    q = forms.CharField(required=False, max_length=200,
+                        widget=forms.TextInput(attrs={"placeholder": "Search listings"}))
+    category = forms.ChoiceField(required=False, choices=[("", "Any category")] + Listing.CATEGORY_CHOICES)
+    status = forms.ChoiceField(required=False, choices=STATUS_CHOICES)
+    min_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2,
+                                   widget=forms.NumberInput(attrs={"placeholder": "Min price", "step": "0.01"}))
+    max_price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2,
+                                   widget=forms.NumberInput(attrs={"placeholder": "Max price", "step": "0.01"}))
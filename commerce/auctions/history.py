@@ -0,0 +1,46 @@
+"""
+Bid history.
+
+Every accepted bid is folded into per-minute and per-hour BidPriceBucket
+rows inside the bid's transaction, so a listing's price series is read
+from at most one row per minute or hour however many bids it has. The
+raw bids are served newest first by keyset pagination.
+"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Bid, BidPriceBucket
+from .pagination import keyset_page
+
+RESOLUTIONS = {
+    BidPriceBucket.MINUTE: lambda at: at.replace(second=0, microsecond=0),
+    BidPriceBucket.HOUR: lambda at: at.replace(minute=0, second=0, microsecond=0),
+}
+
+
+def record_bid(bid):
+    """
+    Adds an accepted bid to its listing's buckets. Called in the bid's
+    transaction, after the listing row has been updated, so bids on one
+    listing are recorded one at a time.
+    """
+    for resolution, truncate in RESOLUTIONS.items():
+        start = truncate(bid.created_at)
+        updated = BidPriceBucket.objects.filter(
+            listing_id=bid.listing_id, resolution=resolution, start=start,
+        ).update(count=F("count") + 1, max_amount=Greatest("max_amount", bid.amount), last_amount=bid.amount)
+        if not updated:
+            BidPriceBucket.objects.create(listing_id=bid.listing_id, resolution=resolution, start=start,
+                                          count=1, max_amount=bid.amount, last_amount=bid.amount)
+
+
+def price_series(listing_id, resolution=BidPriceBucket.MINUTE):
+    return list(BidPriceBucket.objects.filter(listing_id=listing_id, resolution=resolution)
+                .order_by("start").values("start", "count", "max_amount", "last_amount"))
+
+
+def bid_page(listing_id, cursor=None, size=50):
+    """
+    Returns (bids, next_cursor) for a listing, newest first.
+    """
+    return keyset_page(Bid.objects.filter(listing_id=listing_id).select_related("user"), cursor, size)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from auctions.models import Bid, Listing
+
+
+class Command(BaseCommand):
+    help = "Recompute every listing's current_price and highest_bidder from its bids."
+
+    def handle(self, *args, **options):
+        top_bid = Bid.objects.filter(listing=OuterRef("pk")).order_by("-amount", "created_at")
+        updated = Listing.objects.update(
+            current_price=Coalesce(Subquery(top_bid.values("amount")[:1]), F("starting_bid")),
+            highest_bidder=Subquery(top_bid.values("user")[:1]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} listings."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.closing import BATCH_SIZE, close_expired
+
+
+class Command(BaseCommand):
+    help = ("Close listings whose end time has passed and record their winners. "
+            "Run it from cron, or with --interval as a long-running worker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help=f"Listings closed per UPDATE (default: {BATCH_SIZE}).")
+        parser.add_argument("--interval", type=float,
+                            help="Keep running, sweeping every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            closed = close_expired(batch_size=options["batch_size"])
+            if closed or not options["interval"]:
+                self.stdout.write(self.style.SUCCESS(f"Closed {closed} expired listings."))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, Max, OuterRef
+from django.utils import timezone
+
+from auctions.models import Bid, BidPriceBucket, CategoryStats, Comment, Listing, Notification, User
+from auctions.pagination import encode_cursor, keyset_queryset
+from auctions.search import search_listings
+
+
+class _Row:
+    def __init__(self, pk, created_at):
+        self.pk = pk
+        self.created_at = created_at
+
+
+def hot_queries():
+    """
+    Returns (name, queryset, may_scan) for the queries the views and
+    background jobs issue, with placeholder parameters. `may_scan` marks
+    queries over tables that stay small, where a scan is expected.
+    """
+    now = timezone.now()
+    cursor = encode_cursor(_Row(1000, now))
+    watched = User.watchlist.through.objects
+    return [
+        ("index page", keyset_queryset(Listing.objects.select_related("maker")), False),
+        ("index page (cursor)", keyset_queryset(Listing.objects.select_related("maker"), cursor), False),
+        ("category page", keyset_queryset(Listing.objects.filter(category="toys").select_related("maker")), False),
+        ("category page (cursor)",
+         keyset_queryset(Listing.objects.filter(category="toys").select_related("maker"), cursor), False),
+        ("watchlist page", keyset_queryset(Listing.objects.filter(watching_users=1).select_related("maker")), False),
+        ("listing detail", Listing.objects.select_related("maker", "highest_bidder").annotate(
+            watched=Exists(watched.filter(listing_id=OuterRef("pk"), user_id=1))).filter(pk=1), False),
+        ("listing comments", keyset_queryset(Comment.objects.filter(listing_id=1).select_related("user")), False),
+        ("bid history", keyset_queryset(Bid.objects.filter(listing_id=1).select_related("user"), cursor, 50), False),
+        ("price series", BidPriceBucket.objects.filter(listing_id=1, resolution="minute").order_by("start"), False),
+        ("search", keyset_queryset(search_listings(Listing.objects.all(), query="lamp", status="open",
+                                                   max_price=Decimal("100"))), False),
+        ("category stats refresh", Listing.objects.filter(category="toys", closed=False).order_by()
+         .values("category").annotate(n=Count("pk")), False),
+        ("category newest listing", Listing.objects.filter(category="toys").order_by()
+         .values("category").annotate(at=Max("created_at")), False),
+        ("category newest bid", Bid.objects.filter(listing__category="toys").order_by()
+         .values("listing__category").annotate(at=Max("created_at")), False),
+        ("categories page", CategoryStats.objects.all(), True),
+        ("expiry sweep", Listing.objects.filter(closed=False, ends_at__lte=now)
+         .order_by("ends_at").values_list("id", flat=True)[:500], False),
+        ("listing watchers", watched.filter(listing_id=1).values_list("user_id", flat=True), False),
+        ("notifications page", Notification.objects.filter(user_id=1).select_related("listing")
+         .order_by("read", "-updated_at")[:50], False),
+    ]
+
+
+def full_scans(plan, limited=False):
+    """
+    Returns the lines of a query plan that read a whole table or index.
+
+    On SQLite only SEARCH lines are bounded. A SCAN of an index is let
+    through for a `limited` query (one with a LIMIT) whose ORDER BY the
+    index already satisfies, i.e. nothing is sorted in a temp B-tree, as
+    the scan then stops after LIMIT rows.
+    """
+    if connection.vendor == "sqlite":
+        lines = [line.strip() for line in plan.splitlines()]
+        scans = [line for line in lines if " SCAN " in f" {line} " and "VIRTUAL TABLE" not in line]
+        ordered_by_index = not any("TEMP B-TREE" in line and "ORDER BY" in line for line in lines)
+        if limited and ordered_by_index:
+            scans = [line for line in scans if "USING INDEX" not in line and "USING COVERING INDEX" not in line]
+        return scans
+    return [line.strip() for line in plan.splitlines() if "Seq Scan" in line or "Full scan" in line]
+
+
+class Command(BaseCommand):
+    help = ("Run EXPLAIN on the auction site's hot queries and fail if any of them "
+            "scans a whole table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan, not just scans.")
+
+    def handle(self, *args, **options):
+        flagged = []
+        for name, queryset, may_scan in hot_queries():
+            plan = queryset.explain()
+            scans = full_scans(plan, limited=queryset.query.high_mark is not None)
+            if scans and not may_scan:
+                flagged.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}"))
+            else:
+                self.stdout.write(f"ok         {name}")
+            if options["verbose_plans"] or (scans and not may_scan):
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+        if flagged:
+            raise CommandError(f"{len(flagged)} hot queries scan a whole table: {', '.join(flagged)}")
+        self.stdout.write(self.style.SUCCESS("No full table scans."))
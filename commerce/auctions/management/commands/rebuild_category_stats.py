@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auctions import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-category listing stats from the listings table."
+
+    def handle(self, *args, **options):
+        updated = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {updated} categories."))
@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_current_price(apps, schema_editor):
+    # Bids are only accepted against a non-null current_price, so fill in
+    # listings created before the column existed.
+    Listing = apps.get_model("auctions", "Listing")
+    Bid = apps.get_model("auctions", "Bid")
+    top_bid = Bid.objects.filter(listing=OuterRef("pk")).order_by("-amount", "created_at")
+    Listing.objects.filter(current_price__isnull=True).update(
+        current_price=Coalesce(Subquery(top_bid.values("amount")[:1]), F("starting_bid")),
+        highest_bidder=Subquery(top_bid.values("user")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0006_listing_current_price_listing_highest_bidder'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_current_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def populate_category_stats(apps, schema_editor):
+    Listing = apps.get_model("auctions", "Listing")
+    CategoryStats = apps.get_model("auctions", "CategoryStats")
+    categories = (Listing.objects.exclude(category__isnull=True).exclude(category="")
+                  .values_list("category", flat=True).distinct())
+    CategoryStats.objects.bulk_create([CategoryStats(category=c) for c in set(categories)])
+    Bid = apps.get_model("auctions", "Bid")
+    listings = Listing.objects.filter(category=OuterRef("category")).order_by().values("category")
+    open_listings = listings.filter(closed=False)
+    newest_listing = Subquery(listings.annotate(at=Max("created_at")).values("at"))
+    newest_bid = Subquery(Bid.objects.filter(listing__category=OuterRef("category")).order_by()
+                          .values("listing__category").annotate(at=Max("created_at")).values("at"))
+    CategoryStats.objects.update(
+        open_count=Coalesce(Subquery(open_listings.annotate(n=Count("pk")).values("n")), 0),
+        min_price=Subquery(open_listings.annotate(price=Min("current_price")).values("price")),
+        max_price=Subquery(open_listings.annotate(price=Max("current_price")).values("price")),
+        last_activity=Greatest(Coalesce(newest_bid, newest_listing), newest_listing),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0007_backfill_current_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50, unique=True)),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'category stats',
+                'ordering': ['category'],
+            },
+        ),
+        migrations.RunPython(populate_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# An external-content FTS5 index over the listing title and description.
+# The triggers keep it in sync; the update trigger only fires for the
+# indexed columns, so bids (which update the price) don't touch it.
+# SQLite drops the triggers whenever Django rebuilds auctions_listing to
+# alter it, so such migrations must run TRIGGER_SQL again.
+TRIGGER_SQL = [
+    """CREATE TRIGGER auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE auctions_listing_fts USING fts5(
+        title, description, content='auctions_listing', content_rowid='id'
+    )""",
+    *TRIGGER_SQL,
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_insert",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_delete",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_update",
+    "DROP TABLE IF EXISTS auctions_listing_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    # Other databases use the search backend's own matching
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0008_categorystats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import TruncHour, TruncMinute
+
+
+def backfill_buckets(apps, schema_editor):
+    Bid = apps.get_model("auctions", "Bid")
+    BidPriceBucket = apps.get_model("auctions", "BidPriceBucket")
+    for resolution, trunc in [("minute", TruncMinute), ("hour", TruncHour)]:
+        # Accepted bids on a listing only ever rise, so the last amount in a
+        # bucket is its maximum
+        rows = (Bid.objects.annotate(start=trunc("created_at")).values("listing_id", "start")
+                .annotate(count=Count("id"), max_amount=Max("amount")).order_by())
+        BidPriceBucket.objects.bulk_create([
+            BidPriceBucket(listing_id=row["listing_id"], resolution=resolution, start=row["start"],
+                           count=row["count"], max_amount=row["max_amount"], last_amount=row["max_amount"])
+            for row in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BidPriceBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_buckets', to='auctions.listing')),
+            ],
+            options={
+                'ordering': ['start'],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'resolution', 'start'), name='auctions_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+listing_fts = import_module("auctions.migrations.0009_listing_fts")
+
+
+def recreate_fts_triggers(apps, schema_editor):
+    # Adding the column rebuilds auctions_listing on SQLite, dropping its triggers
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in listing_fts.TRIGGER_SQL:
+        schema_editor.execute(sql.replace("CREATE TRIGGER", "CREATE TRIGGER IF NOT EXISTS", 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_composite_indexes'),
+    ]
+
+    operations = [
+        # Recreate the triggers after the column is removed again on the way back
+        migrations.RunPython(migrations.RunPython.noop, recreate_fts_triggers),
+        migrations.AddField(
+            model_name='listing',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+    ]
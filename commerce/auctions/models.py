@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
 
 
 class User(AbstractUser):
@@ -26,15 +27,66 @@ class Listing(models.Model):
     closed = models.BooleanField(default=False)
     maker = models.ForeignKey(User, on_delete=models.CASCADE, related_name="listings")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized from the highest Bid, updated when a bid is placed
+    # (see bidding.place_bid) so pages don't query bids per listing.
+    # `manage.py backfill_listing_prices` recomputes them.
+    current_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    highest_bidder = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True,
+                                       related_name="leading_listings")
+    # Listings without an end time stay open until the maker closes them.
+    # `manage.py close_expired_auctions` closes the others once they're due.
+    ends_at = models.DateTimeField(blank=True, null=True)
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True,
+                               related_name="won_listings")
+    # Bumped whenever the listing's card would render differently (a bid,
+    # closing or an edit); cached card fragments are keyed by it.
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of all listings and of one category, newest first
+            models.Index(fields=["created_at", "id"], name="auctions_listing_created_idx"),
+            models.Index(fields=["category", "created_at", "id"], name="auctions_listing_cat_idx"),
+            # Category stats aggregate a category's open listings
+            models.Index(fields=["category", "closed"], name="auctions_listing_open_idx"),
+            # The expiry sweep reads only open listings that are due. A partial
+            # index stays small as closed listings pile up, and matches the
+            # `NOT closed` condition Django generates for closed=False.
+            models.Index(fields=["ends_at"], condition=models.Q(closed=False), name="auctions_listing_due_idx"),
+        ]
 
     def __str__(self):
         return self.title
+
+    # Written only by bidding.place_bid and the closing module, with
+    # conditional UPDATEs. Saving an instance loaded before a bid or a close
+    # must not write its stale copies back, so saves leave these out.
+    MANAGED_FIELDS = frozenset({"current_price", "highest_bidder", "closed", "winner"})
+
+    def save(self, *args, **kwargs):
+        if self.current_price is None:
+            self.current_price = self.starting_bid
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = {field.name for field in self._meta.concrete_fields
+                             if not field.primary_key} - self.MANAGED_FIELDS
+        kwargs["update_fields"] = {*update_fields, "version"}
+        # Bump the row's version, not our copy's, which a bid may have
+        # overtaken; a repeated version would serve the stale cached card
+        self.version = F("version") + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
     
     def highest_bid_obj(self):
         return self.bids.order_by("-amount").first()
 
     @property
     def highest_bid(self):
+        if self.current_price is not None:
+            return self.current_price
         highest = self.highest_bid_obj()
         return highest.amount if highest else self.starting_bid
 
@@ -46,15 +98,112 @@ class Bid(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="bids")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A listing's highest bid, and its bid history newest first
+            models.Index(fields=["listing", "amount"], name="auctions_bid_amount_idx"),
+            models.Index(fields=["listing", "created_at", "id"], name="auctions_bid_created_idx"),
+        ]
+
     def __str__(self):
         return f"${self.amount} by {self.user} on {self.listing}"
 
 
+class BidPriceBucket(models.Model):
+    """
+    A listing's bids within one minute or hour, pre-aggregated as bids are
+    placed (see history.record_bid) so price charts don't read every Bid.
+    """
+    MINUTE = "minute"
+    HOUR = "hour"
+    RESOLUTION_CHOICES = [
+        (MINUTE, "Minute"),
+        (HOUR, "Hour"),
+    ]
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="price_buckets")
+    resolution = models.CharField(max_length=6, choices=RESOLUTION_CHOICES)
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    last_amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ["start"]
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "resolution", "start"], name="auctions_bucket_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.listing} {self.resolution} {self.start}: {self.count} bids"
+
+
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     content = models.TextField()
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="comments")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing", "created_at", "id"], name="auctions_comment_listing_idx"),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user} on {self.listing}"
+
+
+class CategoryStats(models.Model):
+    """
+    Aggregates over a category's open listings, kept up to date by
+    auctions.stats when listings are created, closed or bid on.
+    """
+    category = models.CharField(max_length=50, unique=True)
+    open_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    last_activity = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["category"]
+        verbose_name_plural = "category stats"
+
+    def __str__(self):
+        return f"{self.category}: {self.open_count} open"
+
+
+class Notification(models.Model):
+    """
+    A digest of events on a watched listing. Events are coalesced into the
+    user's unread notification for the listing and kind, so a burst of bids
+    bumps `count` on one row instead of adding a row per bid.
+    """
+    OUTBID = "outbid"
+    ENDED = "ended"
+    KIND_CHOICES = [
+        (OUTBID, "New highest bid"),
+        (ENDED, "Auction ended"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="notifications")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    count = models.PositiveIntegerField(default=1)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The notifications page, unread first then newest
+            models.Index(fields=["user", "read", "updated_at"], name="auctions_notification_idx"),
+        ]
+        constraints = [
+            # At most one unread digest per user, listing and kind
+            models.UniqueConstraint(fields=["user", "listing", "kind"], condition=models.Q(read=False),
+                                    name="auctions_notification_one_unread"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.listing} for {self.user}"
@@ -0,0 +1,175 @@
+"""
+Notifications to watchers.
+
+Bids and closes enqueue an event once their transaction commits; the
+bid request does no notification work itself. A background worker
+drains the queue in batches and delivers each batch with, per listing
+and kind, one query for the watchers, then one UPDATE bumping existing
+unread digests and one bulk INSERT for the rest (per distinct count,
+usually just one). Events for the same listing in a batch are merged
+first, and the unread digest keeps absorbing later ones until the user
+reads it.
+
+The queue is pluggable through the AUCTIONS_NOTIFICATION_QUEUE setting
+(a dotted path to a class with put(event) and join()). ThreadQueue is
+the default; InlineQueue delivers synchronously, e.g. for tests or to
+hand events to an external task queue from a subclass.
+"""
+import logging
+import queue
+import threading
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "auctions.notifications.ThreadQueue"
+BATCH_SIZE = 500
+
+# actor_id is the user who caused the event (the bidder) and isn't notified
+NotificationEvent = namedtuple("NotificationEvent", ["kind", "listing_id", "actor_id", "amount"])
+
+
+def deliver(events):
+    """
+    Writes the notifications for a batch of events.
+
+    Watchers aren't notified of their own events: each one's count only
+    includes other users' bids, and the actor of the latest event (the
+    highest bidder, for bids) isn't notified at all.
+    """
+    digests = {}
+    for event in events:
+        key = (event.listing_id, event.kind)
+        if key not in digests:
+            digests[key] = Digest()
+        digests[key].add(event)
+
+    watchers_of = User.watchlist.through.objects
+    now = timezone.now()
+    for (listing_id, kind), digest in digests.items():
+        watchers = set(watchers_of.filter(listing_id=listing_id).values_list("user_id", flat=True))
+        watchers.discard(digest.last_actor_id)
+        # Watchers who also acted in this batch saw fewer events from others
+        by_count = {}
+        for user_id in watchers:
+            count = digest.count - digest.actors.get(user_id, 0)
+            if count:
+                by_count.setdefault(count, set()).add(user_id)
+        if not by_count:
+            continue
+        with transaction.atomic():
+            for count, users in by_count.items():
+                # Write first: on SQLite a transaction that reads and then writes
+                # can fail to upgrade its lock while a bid is being committed
+                unread = Notification.objects.filter(listing_id=listing_id, kind=kind, read=False, user_id__in=users)
+                unread.update(count=F("count") + count, amount=digest.amount, updated_at=now)
+                pending = set(unread.values_list("user_id", flat=True))
+                Notification.objects.bulk_create([
+                    Notification(user_id=user_id, listing_id=listing_id, kind=kind, count=count, amount=digest.amount)
+                    for user_id in users - pending
+                ], ignore_conflicts=True)
+
+
+class Digest:
+    """
+    The events for one listing and kind in a batch.
+    """
+    def __init__(self):
+        self.count = 0
+        self.actors = Counter()
+        self.amount = None
+        self.last_actor_id = None
+
+    def add(self, event):
+        self.count += 1
+        if event.actor_id is not None:
+            self.actors[event.actor_id] += 1
+        self.amount = event.amount
+        self.last_actor_id = event.actor_id
+
+
+class InlineQueue:
+    def put(self, event):
+        deliver([event])
+
+    def join(self):
+        pass
+
+
+class ThreadQueue:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def put(self, event):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="auction-notifications", daemon=True)
+                    self.thread.start()
+        self.queue.put(event)
+
+    def join(self):
+        """
+        Blocks until every queued event has been delivered.
+        """
+        self.queue.join()
+
+    def run(self):
+        while True:
+            events = [self.queue.get()]
+            while len(events) < BATCH_SIZE:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            close_old_connections()
+            try:
+                deliver(events)
+            except Exception:
+                logger.exception("Failed to deliver %d notification events", len(events))
+            finally:
+                close_old_connections()
+                for _ in events:
+                    self.queue.task_done()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = import_string(getattr(settings, "AUCTIONS_NOTIFICATION_QUEUE", DEFAULT_QUEUE))()
+    return _queue
+
+
+@receiver(setting_changed)
+def reset_queue(setting, **kwargs):
+    global _queue
+    if setting == "AUCTIONS_NOTIFICATION_QUEUE":
+        with _queue_lock:
+            _queue = None
+
+
+def notify(kind, listing_id, actor_id=None, amount=None):
+    """
+    Queues an event for the listing's watchers when the current
+    transaction commits.
+    """
+    event = NotificationEvent(kind, listing_id, actor_id, amount)
+    transaction.on_commit(lambda: get_queue().put(event))
@@ -0,0 +1,53 @@
+"""
+Keyset (cursor) pagination for listing pages and comments.
+
+Pages are ordered newest first by (created_at, id) and the cursor encodes
+the last row of the previous page, so fetching any page is an indexed
+range scan of `size + 1` rows: no OFFSET and no COUNT(*).
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 20
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (created_at, id) from a cursor, or None if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_queryset(queryset, cursor=None, size=PAGE_SIZE):
+    """
+    Returns the query for the page after `cursor`, with one extra row to
+    tell whether another page follows.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset[:size + 1]
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """
+    Returns (items, next_cursor) for the page after `cursor`; next_cursor
+    is None on the last page. An invalid cursor gives the first page.
+    """
+    items = list(keyset_queryset(queryset, cursor, size))
+    next_cursor = encode_cursor(items[size - 1]) if len(items) > size else None
+    return items[:size], next_cursor
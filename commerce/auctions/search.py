@@ -0,0 +1,81 @@
+"""
+Listing search.
+
+A backend narrows a Listing queryset to the listings matching a query, so
+the caller can add filters and keyset pagination on top. On SQLite the
+match runs against the FTS5 table `auctions_listing_fts` (created in
+migration 0009 and kept in sync by triggers); other databases fall back
+to case-insensitive substring matching. The AUCTIONS_SEARCH_BACKEND
+setting names a class to use instead, e.g. one built on PostgreSQL's
+full-text search.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r"\w+")
+
+
+def query_terms(query):
+    return WORD_RE.findall(query or "")
+
+
+class SubstringSearch:
+    """
+    Matches listings whose title or description contains every term.
+    Works on any database, but scans the whole table.
+    """
+    def filter(self, queryset, query):
+        for term in query_terms(query):
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset
+
+
+class SQLiteSearch:
+    """
+    Matches listings through the FTS5 index: every term must appear in the
+    title or description, as a word or word prefix.
+    """
+    def filter(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset
+        match = " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            "SELECT rowid FROM auctions_listing_fts WHERE auctions_listing_fts MATCH %s", (match,)))
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteSearch,
+}
+
+
+def get_backend():
+    path = getattr(settings, "AUCTIONS_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, SubstringSearch)()
+
+
+def search_listings(queryset, query="", category=None, status=None, min_price=None, max_price=None):
+    """
+    Returns `queryset` narrowed to the listings matching `query` and the
+    filters. `status` is "open", "closed" or None for both; prices compare
+    against the current (highest) price.
+    """
+    queryset = get_backend().filter(queryset, query)
+    if category:
+        queryset = queryset.filter(category=category)
+    if status == "open":
+        queryset = queryset.filter(closed=False)
+    elif status == "closed":
+        queryset = queryset.filter(closed=True)
+    if min_price is not None:
+        queryset = queryset.filter(current_price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(current_price__lte=max_price)
+    return queryset
@@ -0,0 +1,113 @@
+"""
+Per-category listing stats.
+
+CategoryStats holds one row per category with its open listing count,
+price range and last activity, so the categories page reads
+O(categories) rows instead of scanning every listing. A row is
+recomputed from that category's listings whenever one of them is saved,
+closed or bid on, in a single UPDATE so concurrent writers never
+read-then-write. Last activity is the newest listing or bid in the
+category. New listings and bids move it forward; closes, category moves
+and rebuild() derive it from scratch, which reads every bid in the
+category.
+
+Saves are caught with post_save, so listings created through the admin,
+the shell or fixtures get a row too. Closing and bidding update listings
+with queryset updates, which don't send it, so their callers notify this
+module themselves.
+"""
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from .models import Bid, CategoryStats, Listing
+
+
+def _update(categories, **fields):
+    categories = {category for category in categories if category}
+    CategoryStats.objects.bulk_create([CategoryStats(category=c) for c in categories],
+                                      ignore_conflicts=True)
+    open_listings = Listing.objects.filter(category=OuterRef("category"), closed=False).order_by().values("category")
+    return CategoryStats.objects.filter(category__in=categories).update(
+        open_count=Coalesce(Subquery(open_listings.annotate(n=Count("pk")).values("n")), 0),
+        min_price=Subquery(open_listings.annotate(price=Min("current_price")).values("price")),
+        max_price=Subquery(open_listings.annotate(price=Max("current_price")).values("price")),
+        **fields,
+    )
+
+
+def refresh(categories, activity=None):
+    """
+    Recomputes the counts and price ranges for `categories`, creating any
+    rows that are missing. `activity` is the time of a new listing or bid
+    in them, which last_activity is moved forward to; without it
+    last_activity is left alone.
+    """
+    if activity is None:
+        return _update(categories)
+    activity = Value(activity, output_field=DateTimeField())
+    # GREATEST is NULL if either side is on some databases
+    return _update(categories, last_activity=Greatest(Coalesce("last_activity", activity), activity))
+
+
+def recompute(categories):
+    """
+    Like refresh(), but also derives last_activity from the newest listing
+    or bid, which reads every bid in the categories. For closes and
+    rebuild(), not for every bid.
+    """
+    listings = Listing.objects.filter(category=OuterRef("category")).order_by().values("category")
+    newest_listing = Subquery(listings.annotate(at=Max("created_at")).values("at"))
+    newest_bid = Subquery(Bid.objects.filter(listing__category=OuterRef("category")).order_by()
+                          .values("listing__category").annotate(at=Max("created_at")).values("at"))
+    return _update(categories, last_activity=Greatest(Coalesce(newest_bid, newest_listing), newest_listing))
+
+
+def rebuild():
+    """
+    Creates missing rows and recomputes all of them.
+    """
+    categories = set(Listing.objects.values_list("category", flat=True).distinct())
+    return recompute(categories | set(CategoryStats.objects.values_list("category", flat=True)))
+
+
+@receiver(post_init, sender=Listing)
+def remember_category(sender, instance, **kwargs):
+    # So a save that moves the listing to another category refreshes both.
+    # Read __dict__ so a deferred category isn't loaded just for this.
+    instance._stats_category = instance.__dict__.get("category")
+
+
+@receiver(post_save, sender=Listing)
+def listing_saved(sender, instance, created, **kwargs):
+    category = instance.__dict__.get("category")
+    previous, instance._stats_category = instance._stats_category, category
+    if created:
+        transaction.on_commit(lambda: refresh([category], activity=instance.created_at))
+    elif previous != category:
+        # The old category may have lost its newest listing or bid
+        transaction.on_commit(lambda: recompute([previous, category]))
+    else:
+        transaction.on_commit(lambda: refresh([category]))
+
+
+def bid_placed(bid):
+    """
+    Called when a bid is accepted.
+    """
+    categories = Listing.objects.filter(pk=bid.listing_id).values_list("category", flat=True)
+    transaction.on_commit(lambda: refresh(categories, activity=bid.created_at))
+
+
+def listing_changed(listing_id):
+    """
+    Called after a listing is closed.
+    """
+    listings_changed([listing_id])
+
+
+def listings_changed(listing_ids):
+    transaction.on_commit(lambda: recompute(
+        Listing.objects.filter(pk__in=listing_ids).values_list("category", flat=True)))
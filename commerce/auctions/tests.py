@@ -1,3 +1,548 @@
-from django.test import TestCase
+import random
+import io
+import threading
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .bidding import parse_amount, place_bid
+from .closing import close_expired, close_listing
+from . import closing, stats
+from .events import InProcessBroker, get_broker, listing_channel
+from .models import Bid, BidPriceBucket, CategoryStats, Comment, Listing, Notification, User
+from .notifications import NotificationEvent, deliver, get_queue
+from .search import SubstringSearch, search_listings
+from .pagination import keyset_page
+from .management.commands.explain_queries import full_scans
+
+
+class ParseAmountTests(TestCase):
+    def test_valid_amounts(self):
+        self.assertEqual(parse_amount("12.5"), Decimal("12.50"))
+        self.assertEqual(parse_amount(" 7 "), Decimal("7.00"))
+
+    def test_invalid_amounts(self):
+        for raw in [None, "", "abc", "-1", "0", "1.005", "NaN", "Infinity", "100000000"]:
+            self.assertIsNone(parse_amount(raw), raw)
+
+
+class PlaceBidTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+        self.listing = Listing.objects.create(
+            title="Lamp", description="A lamp", starting_bid=Decimal("10.00"), maker=self.maker)
+
+    def test_bid_must_beat_current_price(self):
+        self.assertFalse(place_bid(self.listing.id, self.bidder, Decimal("10.00")).accepted)
+        self.assertTrue(place_bid(self.listing.id, self.bidder, Decimal("10.01")).accepted)
+        self.assertFalse(place_bid(self.listing.id, self.maker, Decimal("10.01")).accepted)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal("10.01"))
+        self.assertEqual(self.listing.highest_bidder, self.bidder)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_closed_listing_rejects_bids(self):
+        Listing.objects.filter(pk=self.listing.pk).update(closed=True)
+        result = place_bid(self.listing.id, self.bidder, Decimal("50.00"))
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.message, "This auction is closed.")
+        self.assertFalse(Bid.objects.exists())
+
+
+class KeysetPageTests(TestCase):
+    def test_pages_cover_every_listing_once(self):
+        maker = User.objects.create(username="maker")
+        listings = [Listing.objects.create(title=f"Item {i}", description="-", starting_bid=1, maker=maker)
+                    for i in range(7)]
+        # Ties on created_at are broken by id
+        Listing.objects.filter(pk__in=[l.pk for l in listings[2:5]]).update(created_at=listings[2].created_at)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(Listing.objects.all(), cursor, size=3)
+            seen.extend(listing.pk for listing in page)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(l.pk for l in listings))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor_gives_first_page(self):
+        self.assertEqual(keyset_page(Listing.objects.all(), "not a cursor"), ([], None))
+
+
+class ListingPageQueryTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.viewer = User.objects.create(username="viewer")
+        self.listing = Listing.objects.create(
+            title="Clock", description="A clock", starting_bid=Decimal("5.00"), maker=self.maker)
+        for i in range(30):
+            commenter = User.objects.create(username=f"commenter{i}")
+            Comment.objects.create(user=commenter, content=f"Comment {i}", listing=self.listing)
+            place_bid(self.listing.id, commenter, Decimal("6.00") + i)
+        self.viewer.watchlist.add(self.listing)
+
+    def test_query_budget(self):
+        self.client.force_login(self.viewer)
+        # session, user, listing, comments
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("listing", args=[self.listing.id]))
+        self.assertTrue(response.context["listing"].watched)
+        self.assertEqual(response.context["listing"].highest_bidder.username, "commenter29")
+        self.assertEqual(len(response.context["comments"]), 20)
+        self.assertContains(response, "Remove from wishlist")
+
+    def test_anonymous_query_budget(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("listing", args=[self.listing.id]))
+        self.assertContains(response, "Comment 29")
+
+
+@override_settings(AUCTIONS_NOTIFICATION_QUEUE="auctions.notifications.InlineQueue")
+class CategoryStatsTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+
+    def create(self, title, price):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Listing.objects.create(title=title, description="-", starting_bid=Decimal(price),
+                                          category="toys", maker=self.maker)
+
+    def test_stats_follow_create_bid_and_close(self):
+        kite = self.create("Kite", "5.00")
+        yoyo = self.create("Yoyo", "2.00")
+        row = CategoryStats.objects.get(category="toys")
+        self.assertEqual((row.open_count, row.min_price, row.max_price), (2, Decimal("2.00"), Decimal("5.00")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(yoyo.id, self.bidder, Decimal("9.00"))
+        row.refresh_from_db()
+        self.assertEqual((row.min_price, row.max_price), (Decimal("5.00"), Decimal("9.00")))
+
+        Listing.objects.filter(pk=kite.pk).update(closed=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            stats.listing_changed(kite.id)
+        row.refresh_from_db()
+        self.assertEqual((row.open_count, row.min_price, row.max_price), (1, Decimal("9.00"), Decimal("9.00")))
+
+    def test_rebuild(self):
+        Listing.objects.create(title="Ball", description="-", starting_bid=3, category="toys", maker=self.maker)
+        self.assertFalse(CategoryStats.objects.exists())
+        self.assertEqual(stats.rebuild(), 1)
+        self.assertEqual(CategoryStats.objects.get(category="toys").open_count, 1)
+
+    def test_last_activity_is_the_newest_listing_or_bid(self):
+        kite = self.create("Kite", "5.00")
+        row = CategoryStats.objects.get(category="toys")
+        self.assertEqual(row.last_activity, kite.created_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(kite.id, self.bidder, Decimal("6.00"))
+        bid = Bid.objects.get()
+        row.refresh_from_db()
+        self.assertEqual(row.last_activity, bid.created_at)
+
+        # Recomputing without any new activity leaves it alone
+        stats.rebuild()
+        row.refresh_from_db()
+        self.assertEqual(row.last_activity, bid.created_at)
+
+    def test_bids_move_last_activity_without_reading_other_bids(self):
+        kite = self.create("Kite", "5.00")
+        with self.captureOnCommitCallbacks() as callbacks:
+            place_bid(kite.id, self.bidder, Decimal("6.00"))
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertFalse([q for q in queries if '"auctions_bid"' in q["sql"]])
+        row = CategoryStats.objects.get(category="toys")
+        self.assertEqual(row.last_activity, Bid.objects.get().created_at)
+
+    def test_row_is_created_for_listings_saved_anywhere(self):
+        # e.g. the admin or a shell, which don't go through the create view
+        self.create("Kite", "5.00")
+        listing = Listing.objects.get()
+        listing.category = "kites"
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.save()
+        self.assertEqual(CategoryStats.objects.get(category="kites").open_count, 1)
+        self.assertEqual(CategoryStats.objects.get(category="toys").open_count, 0)
+
+    def test_categories_json(self):
+        self.create("Kite", "5.00")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("category_stats"))
+        self.assertEqual(response.json()["categories"][0]["min_price"], "5.00")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        maker = User.objects.create(username="maker")
+        self.lamp = Listing.objects.create(title="Brass lamp", description="An old desk lamp",
+                                           starting_bid=Decimal("15.00"), category="home", maker=maker)
+        self.kite = Listing.objects.create(title="Red kite", description="Flies well on windy days",
+                                           starting_bid=Decimal("8.00"), category="toys", maker=maker)
+        self.shade = Listing.objects.create(title="Lampshade", description="Fits most lamps",
+                                            starting_bid=Decimal("4.00"), category="home", maker=maker,
+                                            closed=True)
+
+    def search(self, **kwargs):
+        return set(search_listings(Listing.objects.all(), **kwargs))
+
+    def test_full_text_match(self):
+        self.assertEqual(self.search(query="lamp"), {self.lamp, self.shade})
+        self.assertEqual(self.search(query="windy kite"), {self.kite})
+        self.assertEqual(self.search(query="lamp kite"), set())
+
+    def test_index_follows_edits(self):
+        Listing.objects.filter(pk=self.kite.pk).update(title="Box kite")
+        self.assertEqual(self.search(query="box"), {self.kite})
+        self.kite.delete()
+        self.assertEqual(self.search(query="kite"), set())
+
+    def test_filters(self):
+        self.assertEqual(self.search(query="lamp", status="open"), {self.lamp})
+        self.assertEqual(self.search(category="home", max_price=Decimal("10")), {self.shade})
+        self.assertEqual(self.search(min_price=Decimal("8"), max_price=Decimal("8")), {self.kite})
+
+    def test_substring_backend_agrees(self):
+        backend = SubstringSearch()
+        self.assertEqual(set(backend.filter(Listing.objects.all(), "lamp")), {self.lamp, self.shade})
+
+    def test_api(self):
+        response = self.client.get(reverse("search_api"), {"q": "lamp", "status": "open"})
+        self.assertEqual([r["title"] for r in response.json()["results"]], ["Brass lamp"])
+        response = self.client.get(reverse("search_api"), {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(AUCTIONS_NOTIFICATION_QUEUE="auctions.notifications.InlineQueue")
+class ListingEventTests(TestCase):
+    def test_broker_fan_out(self):
+        broker = InProcessBroker(maxsize=2)
+        with broker.subscribe("a") as first, broker.subscribe("a") as second, broker.subscribe("b") as other:
+            for n in range(3):
+                broker.publish("a", {"n": n})
+            # A full queue drops its oldest event
+            self.assertEqual([first.get(0)["n"], first.get(0)["n"], first.get(0)], [1, 2, None])
+            self.assertEqual(second.get(0)["n"], 1)
+            self.assertIsNone(other.get(0))
+        self.assertEqual(broker.channels, {})
+
+    def test_stream_pushes_bids(self):
+        maker = User.objects.create(username="maker")
+        bidder = User.objects.create(username="bidder")
+        listing = Listing.objects.create(title="Vase", description="-", starting_bid=Decimal("3.00"), maker=maker)
+
+        response = self.client.get(reverse("listing_events", args=[listing.id]))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b"retry: 3000\n\n")
+        self.assertIn(b'"amount": "3.00"', next(stream))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(listing.id, bidder, Decimal("4.50"))
+        event = next(stream).decode()
+        self.assertIn("event: bid", event)
+        self.assertIn('"bidder": "bidder"', event)
+
+        get_broker().publish(listing_channel(listing.id), {"type": "closed", "data": {}})
+        self.assertIn(b"event: closed", next(stream))
+        self.assertEqual(list(stream), [])
+        response.close()
+
+    def test_stream_of_deleted_listing_closes(self):
+        maker = User.objects.create(username="maker")
+        listing = Listing.objects.create(title="Vase", description="-", starting_bid=Decimal("3.00"), maker=maker)
+        response = self.client.get(reverse("listing_events", args=[listing.id]))
+        # The stream only reads the listing once it starts
+        listing.delete()
+        self.assertEqual(list(response.streaming_content), [b"retry: 3000\n\n", b"event: closed\ndata: {}\n\n"])
+
+
+class ClosingTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+
+    def listing(self, title, ends_in=None):
+        ends_at = None if ends_in is None else timezone.now() + ends_in
+        return Listing.objects.create(title=title, description="-", starting_bid=Decimal("1.00"),
+                                      maker=self.maker, ends_at=ends_at)
+
+    def test_close_listing_records_winner(self):
+        listing = self.listing("Chair")
+        place_bid(listing.id, self.bidder, Decimal("2.00"))
+        self.assertTrue(close_listing(listing.id))
+        self.assertFalse(close_listing(listing.id))
+        listing.refresh_from_db()
+        self.assertTrue(listing.closed)
+        self.assertEqual(listing.winner, self.bidder)
+
+    def test_close_expired_in_batches(self):
+        due = [self.listing(f"Due {i}", timedelta(minutes=5)) for i in range(5)]
+        place_bid(due[0].id, self.bidder, Decimal("3.00"))
+        later = self.listing("Later", timedelta(days=1))
+        forever = self.listing("Forever")
+
+        self.assertEqual(close_expired(now=timezone.now() + timedelta(hours=1), batch_size=2), 5)
+        self.assertEqual(set(Listing.objects.filter(closed=True)), set(due))
+        self.assertEqual(Listing.objects.get(pk=due[0].pk).winner, self.bidder)
+        self.assertFalse(Listing.objects.filter(pk__in=[later.pk, forever.pk], closed=True).exists())
+
+    def test_close_expired_only_announces_listings_it_closed(self):
+        due = [self.listing(f"Due {i}", timedelta(minutes=5)) for i in range(3)]
+        real_close = closing._close
+
+        def close_after_maker(ids):
+            # The maker closes one between the sweep's SELECT and UPDATE
+            close_listing(due[1].id)
+            return real_close(ids)
+
+        with mock.patch.object(closing, "_close", close_after_maker), \
+                mock.patch.object(closing, "publish_listing_event") as publish:
+            self.assertEqual(close_expired(now=timezone.now() + timedelta(hours=1)), 2)
+        self.assertEqual(sorted(call.args[0] for call in publish.call_args_list), [due[0].id, due[1].id, due[2].id])
+        self.assertEqual(Listing.objects.get(pk=due[1].pk).version, 2)
+
+    def test_expired_listing_rejects_bids(self):
+        listing = self.listing("Clock", timedelta(minutes=5))
+        Listing.objects.filter(pk=listing.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        result = place_bid(listing.id, self.bidder, Decimal("5.00"))
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.message, "This auction has ended.")
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.watchers = [User.objects.create(username=f"watcher{i}") for i in range(3)]
+        self.listing = Listing.objects.create(title="Rug", description="-", starting_bid=Decimal("1.00"),
+                                              maker=self.maker)
+        for watcher in self.watchers:
+            watcher.watchlist.add(self.listing)
+
+    def test_bids_coalesce_into_one_digest(self):
+        bidder = self.watchers[0]
+        deliver([NotificationEvent(Notification.OUTBID, self.listing.id, bidder.id, Decimal(n)) for n in range(2, 12)])
+        deliver([NotificationEvent(Notification.OUTBID, self.listing.id, bidder.id, Decimal(n)) for n in range(12, 22)])
+        digests = Notification.objects.filter(kind=Notification.OUTBID)
+        self.assertEqual(sorted(d.user_id for d in digests), [w.id for w in self.watchers[1:]])
+        self.assertEqual({(d.count, d.amount) for d in digests}, {(20, Decimal(21))})
+
+    def test_bidders_in_one_batch_are_not_told_of_their_own_bids(self):
+        first, second, other = self.watchers
+        deliver([
+            NotificationEvent(Notification.OUTBID, self.listing.id, first.id, Decimal(2)),
+            NotificationEvent(Notification.OUTBID, self.listing.id, first.id, Decimal(3)),
+            NotificationEvent(Notification.OUTBID, self.listing.id, second.id, Decimal(4)),
+        ])
+        digests = {d.user_id: (d.count, d.amount) for d in Notification.objects.all()}
+        # The second bidder is winning; the first was outbid once
+        self.assertEqual(digests, {first.id: (1, Decimal(4)), other.id: (3, Decimal(4))})
+
+    def test_reading_starts_a_new_digest(self):
+        event = NotificationEvent(Notification.ENDED, self.listing.id, None, None)
+        deliver([event])
+        self.client.force_login(self.watchers[0])
+        self.assertContains(self.client.get(reverse("notifications")), "The auction has ended.")
+        deliver([event])
+        self.assertEqual(self.watchers[0].notifications.count(), 2)
+        self.assertEqual(self.watchers[1].notifications.get().count, 2)
+
+
+class NotificationWorkerTests(TransactionTestCase):
+    def test_worker_delivers_after_commit(self):
+        maker = User.objects.create(username="maker")
+        watcher = User.objects.create(username="watcher")
+        bidder = User.objects.create(username="bidder")
+        listing = Listing.objects.create(title="Desk", description="-", starting_bid=Decimal("1.00"), maker=maker)
+        watcher.watchlist.add(listing)
+
+        for n in range(2, 22):
+            place_bid(listing.id, bidder, Decimal(n))
+        get_queue().join()
+        digest = watcher.notifications.get()
+        self.assertEqual((digest.kind, digest.count, digest.amount), (Notification.OUTBID, 20, Decimal("21.00")))
+
+
+class BidHistoryTests(TestCase):
+    def setUp(self):
+        maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+        self.listing = Listing.objects.create(title="Map", description="-", starting_bid=Decimal("1.00"), maker=maker)
+
+    def test_buckets_follow_bids(self):
+        for n in range(2, 7):
+            place_bid(self.listing.id, self.bidder, Decimal(n))
+        # Spread the last two bids into a later minute
+        later = timezone.now() + timedelta(minutes=2)
+        for n in range(7, 9):
+            with mock.patch("django.utils.timezone.now", return_value=later):
+                place_bid(self.listing.id, self.bidder, Decimal(n))
+
+        minutes = BidPriceBucket.objects.filter(listing=self.listing, resolution=BidPriceBucket.MINUTE)
+        self.assertEqual([(b.count, b.max_amount, b.last_amount) for b in minutes],
+                         [(5, Decimal("6.00"), Decimal("6.00")), (2, Decimal("8.00"), Decimal("8.00"))])
+        self.assertEqual(sum(b.count for b in BidPriceBucket.objects.filter(resolution=BidPriceBucket.HOUR)), 7)
+
+    def test_api_pages_bids(self):
+        for n in range(2, 60):
+            place_bid(self.listing.id, self.bidder, Decimal(n))
+        url = reverse("bid_history", args=[self.listing.id])
+        with self.assertNumQueries(3):
+            first = self.client.get(url).json()
+        self.assertEqual(len(first["bids"]), 50)
+        self.assertEqual(first["bids"][0]["amount"], "59.00")
+        self.assertEqual(first["series"]["buckets"][-1]["last"], "59.00")
+
+        second = self.client.get(url, {"cursor": first["next_cursor"]}).json()
+        self.assertEqual([b["amount"] for b in second["bids"]], [f"{n}.00" for n in range(9, 1, -1)])
+        self.assertIsNone(second["next_cursor"])
+        self.assertNotIn("series", second)
+        self.assertEqual(self.client.get(url, {"resolution": "day"}).status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command("explain_queries", stdout=out)
+        self.assertIn("No full table scans.", out.getvalue())
+
+    def test_index_scans_count_as_full_scans(self):
+        plan = "3 0 0 SCAN auctions_bid USING COVERING INDEX auctions_bid_amount_idx"
+        self.assertEqual(full_scans(plan), [plan])
+        self.assertEqual(full_scans("2 0 0 SCAN auctions_bid"), ["2 0 0 SCAN auctions_bid"])
+        self.assertEqual(full_scans("3 0 0 SEARCH auctions_bid USING INDEX auctions_bid_created_idx (listing_id=?)"), [])
+
+    def test_index_scan_is_bounded_by_an_ordered_limit(self):
+        plan = "6 0 0 SCAN auctions_listing USING INDEX auctions_listing_created_idx"
+        self.assertEqual(full_scans(plan, limited=True), [])
+        # The index doesn't give the order, so every row is read and sorted
+        sorted_plan = plan + "\n51 0 0 USE TEMP B-TREE FOR ORDER BY"
+        self.assertEqual(full_scans(sorted_plan, limited=True), [plan])
+
+
+class ListingSaveTests(TestCase):
+    def setUp(self):
+        self.maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+        self.listing = Listing.objects.create(title="Clock", description="-", starting_bid=Decimal("5.00"),
+                                              maker=self.maker)
+
+    def test_saving_a_stale_instance_keeps_bids_and_closing(self):
+        edit = Listing.objects.get(pk=self.listing.pk)
+        place_bid(self.listing.id, self.bidder, Decimal("6.00"))
+        close_listing(self.listing.id)
+
+        edit.description = "An old clock"
+        edit.save()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.description, "An old clock")
+        self.assertEqual((self.listing.current_price, self.listing.highest_bidder), (Decimal("6.00"), self.bidder))
+        self.assertEqual((self.listing.closed, self.listing.winner), (True, self.bidder))
+
+    def test_admin_closes_through_the_action(self):
+        admin = User.objects.create_superuser(username="admin", password="-")
+        self.client.force_login(admin)
+        self.client.post(reverse("admin:auctions_listing_changelist"),
+                         {"action": "close_listings", "_selected_action": [self.listing.pk]})
+        self.listing.refresh_from_db()
+        self.assertTrue(self.listing.closed)
+
+
+class ListingCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.maker = User.objects.create(username="maker")
+        self.bidder = User.objects.create(username="bidder")
+        self.listing = Listing.objects.create(title="Globe", description="-", starting_bid=Decimal("7.00"),
+                                              category="home", maker=self.maker)
+
+    def test_cards_are_reused_until_the_listing_changes(self):
+        self.assertContains(self.client.get(reverse("index")), "$7.00")
+        # A stale cached card is served while the version is unchanged...
+        Listing.objects.filter(pk=self.listing.pk).update(current_price=Decimal("8.00"))
+        self.assertContains(self.client.get(reverse("index")), "$7.00")
+
+        # ...and a bid, close or edit bumps the version
+        place_bid(self.listing.id, self.bidder, Decimal("9.00"))
+        self.assertContains(self.client.get(reverse("index")), "$9.00")
+        close_listing(self.listing.id)
+        self.assertContains(self.client.get(reverse("category", args=["home"])), "$9.00")
+        self.assertContains(self.client.get(reverse("index")), "Closed")
+
+        listing = Listing.objects.get(pk=self.listing.pk)
+        listing.title = "Desk globe"
+        listing.save()
+        self.assertEqual(listing.version, 4)
+        self.assertContains(self.client.get(reverse("index")), "Desk globe")
+
+    def test_edit_of_an_instance_loaded_before_a_bid_bumps_the_version(self):
+        self.client.get(reverse("index"))
+        edit = Listing.objects.get(pk=self.listing.pk)
+        place_bid(self.listing.id, self.bidder, Decimal("9.00"))
+        self.assertContains(self.client.get(reverse("index")), "$9.00")
+
+        edit.title = "Desk globe"
+        edit.save()
+        self.assertEqual(edit.version, 3)
+        self.assertContains(self.client.get(reverse("index")), "Desk globe")
+
+
+class ConcurrentBiddingTests(TransactionTestCase):
+    THREADS = 200
+
+    def test_simultaneous_bids(self):
+        maker = User.objects.create(username="maker")
+        bidders = [User.objects.create(username=f"bidder{i}") for i in range(20)]
+        listing = Listing.objects.create(
+            title="Hot item", description="Everyone wants it", starting_bid=Decimal("1.00"), maker=maker)
+
+        rng = random.Random(0)
+        amounts = [Decimal(cents) / 100 for cents in rng.sample(range(101, 100000), self.THREADS)]
+        barrier = threading.Barrier(self.THREADS)
+        results = [None] * self.THREADS
+        errors = []
+
+        def bid(i):
+            try:
+                barrier.wait()
+                results[i] = place_bid(listing.id, bidders[i % len(bidders)], amounts[i])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bid, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        get_queue().join()
+
+        self.assertEqual(errors, [])
+        best = max(range(self.THREADS), key=lambda i: amounts[i])
+        self.assertTrue(results[best].accepted)
+
+        listing.refresh_from_db()
+        self.assertEqual(listing.current_price, amounts[best])
+        self.assertEqual(listing.highest_bidder, bidders[best % len(bidders)])
+
+        # Exactly the accepted bids were stored, each beating the one before it
+        accepted = [result.bid.id for result in results if result.accepted]
+        stored = list(Bid.objects.filter(listing=listing).order_by("id").values_list("id", "amount"))
+        self.assertEqual(sorted(accepted), [bid_id for bid_id, _ in stored])
+        stored_amounts = [amount for _, amount in stored]
+        self.assertEqual(stored_amounts, sorted(set(stored_amounts)))
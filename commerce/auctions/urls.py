@@ -9,8 +9,14 @@ urlpatterns = [
     path("register", views.register, name="register"),
     path("create", views.create, name="create"),
     path("listings/<int:listing>",views.listings,name="listing"),
+    path("listings/<int:listing>/events",views.listing_events,name="listing_events"),
+    path("listings/<int:listing>/bids.json",views.bid_history,name="bid_history"),
     path("watchlist/",views.watchlist,name="watchlist"),
+    path("notifications/",views.notifications,name="notifications"),
     path("category/",views.categories_view,name="categories"),
+    path("category/stats.json",views.category_stats,name="category_stats"),
     path("category/<str:category>/",views.category_view,name="category"),
+    path("search",views.search,name="search"),
+    path("search.json",views.search_api,name="search_api"),
 
 ]
@@ -1,21 +1,31 @@
+import json
+import time
+
 from django.contrib.auth import authenticate, login, logout
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef
 
 
-from .models import User, Listing, Comment, Bid 
-from .forms import CreateListingForm
+from .models import User, Listing, Comment, CategoryStats, Notification
+from .forms import CreateListingForm, SearchForm
+from .bidding import parse_amount, place_bid
+from .pagination import keyset_page
+from .search import search_listings
+from .closing import close_listing
+from .history import RESOLUTIONS, bid_page, price_series
+from .events import get_broker, listing_channel, publish_listing_event
 
 
 def index(request):
-    
+    listings, next_cursor = keyset_page(Listing.objects.select_related("maker"), request.GET.get("cursor"))
     return render(request, "auctions/index.html",{
-        "listings":Listing.objects.all(),
+        "listings":listings,
+        "next_cursor": next_cursor,
     })
 
 
@@ -79,14 +89,22 @@ def create(request):
             listing.maker = request.user
             listing.save()
             return redirect("index")
-    form = CreateListingForm()
+    else:
+        form = CreateListingForm()
     return render(request, "auctions/create.html", {
         "form":form
     })
 
 
 def listings(request, listing):
-    listing_obj = get_object_or_404(Listing, pk=listing)
+    # The current price and highest bidder are denormalized onto Listing, so
+    # the whole page is one query for the listing (with its maker, bidder and
+    # watch state) and one for a page of comments.
+    queryset = Listing.objects.select_related("maker", "highest_bidder")
+    if request.user.is_authenticated:
+        queryset = queryset.annotate(watched=Exists(User.watchlist.through.objects.filter(
+            listing_id=OuterRef("pk"), user_id=request.user.pk)))
+    listing_obj = get_object_or_404(queryset, pk=listing)
 
     if request.method == "POST":
         if request.user.is_authenticated:
@@ -95,24 +113,15 @@ def listings(request, listing):
             elif "remove" in request.POST:
                 request.user.watchlist.remove(listing_obj)
             elif "close" in request.POST and request.user == listing_obj.maker:
-                listing_obj.closed = True
-                listing_obj.save()
+                close_listing(listing_obj.id)
             elif "bid_amount" in request.POST and not listing_obj.closed:
-                try:
-                    print("Raw bid amount:", request.POST.get("bid_amount"))
-                    bid_amount = float(request.POST.get("bid_amount"))
-                    current_highest = listing_obj.highest_bid
-
-                    if bid_amount > current_highest:
-                        Bid.objects.create(
-                            user=request.user,
-                            amount=bid_amount,
-                            listing=listing_obj
-                        )
-                    else:
-                        messages.error(request, f"Your bid must be higher than the current highest bid (${current_highest}).")
-                except (ValueError, TypeError):
+                bid_amount = parse_amount(request.POST.get("bid_amount"))
+                if bid_amount is None:
                     messages.error(request, "Invalid bid amount.")
+                else:
+                    result = place_bid(listing_obj.id, request.user, bid_amount)
+                    if not result.accepted:
+                        messages.error(request, result.message)
             elif "content" in request.POST:
                 content = request.POST.get("content").strip()
                 try:
@@ -121,31 +130,196 @@ def listings(request, listing):
                         content=content,
                         listing=listing_obj,
                     )
+                    publish_listing_event(listing_obj.id, "comment", {
+                        "user": request.user.username,
+                        "content": content,
+                    })
                 except (ValueError,TypeError):
                     messages.error(request, "Invalid Comment Text.")
             return redirect("listing", listing=listing_obj.id)
+    comments, next_cursor = keyset_page(listing_obj.comments.select_related("user"), request.GET.get("cursor"))
     return render(request, "auctions/listings.html", {
         "listing": listing_obj,
+        "comments": comments,
+        "next_cursor": next_cursor,
     })
 
+
+def bid_history(request, listing):
+    get_object_or_404(Listing.objects.only("id"), pk=listing)
+    resolution = request.GET.get("resolution", "minute")
+    if resolution not in RESOLUTIONS:
+        return JsonResponse({"error": f"resolution must be one of: {', '.join(RESOLUTIONS)}"}, status=400)
+    cursor = request.GET.get("cursor")
+    bids, next_cursor = bid_page(listing, cursor)
+    data = {
+        "bids": [
+            {"amount": str(bid.amount), "bidder": bid.user.username, "created_at": bid.created_at}
+            for bid in bids
+        ],
+        "next_cursor": next_cursor,
+    }
+    # The series comes with the first page only
+    if not cursor:
+        data["series"] = {
+            "resolution": resolution,
+            "buckets": [
+                {
+                    "start": bucket["start"],
+                    "count": bucket["count"],
+                    "max": str(bucket["max_amount"]),
+                    "last": str(bucket["last_amount"]),
+                }
+                for bucket in price_series(listing, resolution)
+            ],
+        }
+    return JsonResponse(data)
+
+
+# Each open stream holds a worker thread, so streams end after a while and
+# the browser's EventSource reconnects; comments keep proxies from timing out.
+EVENT_STREAM_SECONDS = 300
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+def _sse(event_type, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def _listing_event_stream(listing_id):
+    with get_broker().subscribe(listing_channel(listing_id)) as subscription:
+        # Read the state after subscribing, so no event falls in between
+        state = Listing.objects.filter(pk=listing_id).values(
+            "current_price", "highest_bidder__username", "closed").first()
+        yield "retry: 3000\n\n"
+        if state is None:
+            # Deleted since the request was checked; there's nothing to follow
+            yield _sse("closed", {})
+            return
+        yield _sse("bid", {"amount": str(state["current_price"]), "bidder": state["highest_bidder__username"]})
+        if state["closed"]:
+            yield _sse("closed", {})
+            return
+
+        deadline = time.monotonic() + EVENT_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=EVENT_KEEPALIVE_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event["type"], event["data"], event.get("id"))
+            if event["type"] == "closed":
+                return
+
+
+def listing_events(request, listing):
+    get_object_or_404(Listing.objects.only("id"), pk=listing)
+    response = StreamingHttpResponse(_listing_event_stream(listing), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def watchlist(request):
-    items = request.user.watchlist.all()
+    items, next_cursor = keyset_page(request.user.watchlist.select_related("maker"), request.GET.get("cursor"))
     return render(request, "auctions/watchlist.html",{
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor,
     })
 
 
 def categories_view(request):
-    categories = Listing.objects.values_list('category', flat=True).distinct()
     return render(request, "auctions/categories.html", {
-        "categories": categories
+        "categories": CategoryStats.objects.all()
+    })
+
+
+def category_stats(request):
+    return JsonResponse({
+        "categories": [
+            {
+                "category": row.category,
+                "open_count": row.open_count,
+                "min_price": None if row.min_price is None else str(row.min_price),
+                "max_price": None if row.max_price is None else str(row.max_price),
+                "last_activity": row.last_activity,
+            }
+            for row in CategoryStats.objects.all()
+        ]
     })
     
 def category_view(request,category):
-    items = Listing.objects.filter(category=category)
+    items, next_cursor = keyset_page(Listing.objects.filter(category=category).select_related("maker"),
+                                     request.GET.get("cursor"))
     return render(request, "auctions/category.html", {
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor,
+    })
+
+
+def _search(request):
+    """
+    Returns (form, listings, next_cursor) for the search parameters in the
+    query string.
+    """
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return form, [], None
+    queryset = search_listings(
+        Listing.objects.select_related("maker"),
+        query=form.cleaned_data["q"],
+        category=form.cleaned_data["category"],
+        status=form.cleaned_data["status"],
+        min_price=form.cleaned_data["min_price"],
+        max_price=form.cleaned_data["max_price"],
+    )
+    listings, next_cursor = keyset_page(queryset, request.GET.get("cursor"))
+    return form, listings, next_cursor
+
+
+def search(request):
+    form, listings, next_cursor = _search(request)
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_query = params.urlencode()
+    return render(request, "auctions/search.html", {
+        "form": form,
+        "listings": listings,
+        "next_query": next_query,
+    })
+
+
+def search_api(request):
+    form, listings, next_cursor = _search(request)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    return JsonResponse({
+        "results": [
+            {
+                "id": listing.id,
+                "title": listing.title,
+                "category": listing.category,
+                "closed": listing.closed,
+                "current_price": str(listing.highest_bid),
+                "maker": listing.maker.username,
+                "url": reverse("listing", args=[listing.id]),
+            }
+            for listing in listings
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def notifications(request):
+    items = list(request.user.notifications.select_related("listing").order_by("read", "-updated_at")[:50])
+    # Reading the page marks the digests read, so new events start new ones
+    Notification.objects.filter(pk__in=[n.pk for n in items if not n.read]).update(read=True)
+    return render(request, "auctions/notifications.html", {
+        "items": items,
     })
-    
-     
\ No newline at end of file
@@ -78,11 +78,29 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Wait for concurrent writers instead of failing with "database is locked"
+        'OPTIONS': {'timeout': 20},
+        # A file rather than shared in-memory database, so the concurrent
+        # bidding test can write from several threads
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
 AUTH_USER_MODEL = 'auctions.User'
 
+# Cache
+# Listing cards are cached as template fragments keyed by the listing's
+# version (see auctions/templates/auctions/listing_card.html). Use a shared
+# backend such as Memcached or Redis when running several processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
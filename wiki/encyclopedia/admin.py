@@ -1,3 +1,5 @@
 from django.contrib import admin
+from .models import Link, Revision
 
-# Register your models here.
+admin.site.register(Revision)
+admin.site.register(Link)
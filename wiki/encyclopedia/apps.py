@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class EncyclopediaConfig(AppConfig):
     name = 'encyclopedia'
+
+    def ready(self):
+        # Connect the entry_saved and entries_saved receivers
+        from . import catalog, links, render_cache, search_index, suggest  # noqa: F401
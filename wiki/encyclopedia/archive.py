@@ -0,0 +1,63 @@
+"""
+Streaming archives of entries, used by the export_entries and
+import_entries commands. Two formats are supported:
+
+    jsonl   one {"title": ..., "content": ...} object per line
+    tar     entries/<title>.md members, optionally gzip/bz2/xz compressed
+
+Both are read and written one entry at a time, so memory use does not
+depend on the size of the corpus.
+"""
+import io
+import json
+import os
+import re
+import tarfile
+import time
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def guess_format(path):
+    return "tar" if path.endswith(TAR_SUFFIXES) else "jsonl"
+
+
+def _tar_mode(path, direction):
+    for suffix, compression in ((".gz", "gz"), (".tgz", "gz"), (".bz2", "bz2"), (".xz", "xz")):
+        if path.endswith(suffix):
+            return f"{direction}|{compression}"
+    return f"{direction}|"
+
+
+def write_jsonl(stream, entries):
+    """
+    Writes (title, content) pairs to a binary stream.
+    """
+    for title, content in entries:
+        stream.write(json.dumps({"title": title, "content": content}).encode("utf-8") + b"\n")
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            record = json.loads(line)
+            yield record["title"], record["content"]
+
+
+def write_tar(stream, entries, path=""):
+    with tarfile.open(fileobj=stream, mode=_tar_mode(path, "w")) as archive:
+        for title, content in entries:
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(f"entries/{title}.md")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(data))
+
+
+def read_tar(stream, path=""):
+    with tarfile.open(fileobj=stream, mode=_tar_mode(path, "r")) as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith(".md"):
+                continue
+            title = re.sub(r"\.md$", "", os.path.basename(member.name))
+            yield title, archive.extractfile(member).read().decode("utf-8")
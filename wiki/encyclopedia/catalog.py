@@ -0,0 +1,280 @@
+"""
+Catalog of entry titles.
+
+The catalog lists the entries once and then stays in sync through the
+entry_saved signal. Entries added or removed outside the app are picked
+up by comparing the backend's change stamp (the entries directory's
+mtime for the file backend), which is a single stat() or query per
+lookup instead of a full listing.
+
+Each full listing is also saved to WIKI_CATALOG_PATH along with the stamp
+it was taken at, so a new process only lists the entries again if they
+changed since. Any process may rewrite the file; a stale one is ignored.
+Titles added through entry_saved are not saved, since another process
+may have added one at the same moment that this one never saw.
+
+Titles are sorted ignoring case (by their casefold(), then as written),
+and grouped into the index's alphabetical buckets the same way, so
+"apple" sorts and pages next to "Apple" rather than after "Zebra".
+
+Substring lookups search one newline-joined, casefolded copy of the
+titles with str.find, so the scan runs in C rather than per title; the
+copy is built on first use and dropped whenever the titles change.
+
+The catalog also keeps an order-independent signature of the title set
+(the XOR of each title's hash) for use as the index page's ETag.
+"""
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .signals import STORAGE_SETTINGS, entries_saved, entry_saved
+from .storage import get_backend
+
+
+def _title_hash(title):
+    return int.from_bytes(hashlib.sha256(title.encode("utf-8")).digest()[:16], "big")
+
+
+def sort_key(title):
+    return title.casefold(), title
+
+
+def initial(title):
+    """
+    Returns the index bucket a title belongs to, e.g. "A" for "apple".
+    """
+    return title[:1].casefold().upper()
+
+
+def _catalog_path():
+    return getattr(settings, "WIKI_CATALOG_PATH",
+                   os.path.join(settings.BASE_DIR, "catalog.json"))
+
+
+class TitleCatalog:
+    def __init__(self, backend=None, path=None):
+        self._backend = backend
+        self._path = path
+        self.lock = threading.Lock()
+        self.titles = ()
+        self.by_lower = {}
+        self.signature = 0
+        self.buckets = Counter()
+        self._folded = None
+        self._folded_starts = None
+        self.stamp = None
+        self.loaded = False
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    @property
+    def path(self):
+        return self._path or _catalog_path()
+
+    def _read_saved(self, stamp):
+        """
+        Returns the saved titles if they were listed at `stamp`, else None.
+        """
+        if stamp is None:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("backend") != type(self.backend).__name__ or data.get("stamp") != list(stamp):
+            return None
+        return data["titles"]
+
+    def _save(self):
+        if self.stamp is None:
+            # Without a stamp a saved copy could never be trusted
+            return
+        data = {"backend": type(self.backend).__name__, "stamp": list(self.stamp), "titles": self.titles}
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Only an optimization; the next process lists the entries instead
+            pass
+
+    def _load(self, stamp):
+        saved = self._read_saved(stamp)
+        self.titles = tuple(sorted(saved if saved is not None else self.backend.list_titles(),
+                                   key=sort_key))
+        self.by_lower = {title.lower(): title for title in self.titles}
+        self.signature = 0
+        for title in self.titles:
+            self.signature ^= _title_hash(title)
+        self.buckets = Counter(initial(title) for title in self.titles)
+        self._folded = None
+        self.stamp = stamp
+        self.loaded = True
+        if saved is None:
+            self._save()
+
+    def _refresh(self):
+        # With no stamp available, rely on entry_saved alone
+        stamp = self.backend.stamp()
+        if not self.loaded or (stamp is not None and stamp != self.stamp):
+            self._load(stamp)
+
+    def all(self):
+        """
+        Returns a sorted tuple of all titles. It is shared, not copied.
+        """
+        with self.lock:
+            self._refresh()
+            return self.titles
+
+    def lookup(self, title):
+        """
+        Returns the stored spelling of `title`, ignoring case, or None.
+        """
+        with self.lock:
+            self._refresh()
+            return self.by_lower.get(title.lower())
+
+    def prefixed(self, prefix, limit=50):
+        """
+        Returns up to `limit` titles starting with `prefix`, ignoring case.
+        """
+        key = prefix.casefold()
+        with self.lock:
+            self._refresh()
+            i = bisect.bisect_left(self.titles, (key, ""), key=sort_key)
+            matches = []
+            while i < len(self.titles) and len(matches) < limit and self.titles[i].casefold().startswith(key):
+                matches.append(self.titles[i])
+                i += 1
+            return matches
+
+    def containing(self, text, limit=50):
+        """
+        Returns up to `limit` titles containing `text`, ignoring case, in
+        sorted order.
+        """
+        key = text.casefold()
+        if not key or "\n" in key:
+            return []
+        with self.lock:
+            self._refresh()
+            if self._folded is None:
+                self._folded = "\n".join(title.casefold() for title in self.titles)
+                self._folded_starts = list(itertools.accumulate(
+                    (len(title.casefold()) + 1 for title in self.titles[:-1]), initial=0))
+            starts = self._folded_starts
+            matches = []
+            pos = self._folded.find(key)
+            while pos != -1 and len(matches) < limit:
+                i = bisect.bisect_right(starts, pos) - 1
+                matches.append(self.titles[i])
+                if i + 1 == len(starts):
+                    break
+                pos = self._folded.find(key, starts[i + 1])
+            return matches
+
+    def choice(self):
+        """
+        Returns a random title, or None if there are no entries.
+        """
+        with self.lock:
+            self._refresh()
+            return random.choice(self.titles) if self.titles else None
+
+    def page(self, after=None, start=None, limit=200):
+        """
+        Returns up to `limit` titles in sorted order and whether more follow.
+        The page begins right after the title `after`, or else at the first
+        title >= `start` ignoring case. Either way it is a binary search on
+        sort_key, not a scan.
+        """
+        with self.lock:
+            self._refresh()
+            if after is not None:
+                i = bisect.bisect_right(self.titles, sort_key(after), key=sort_key)
+            elif start is not None:
+                i = bisect.bisect_left(self.titles, (start.casefold(), ""), key=sort_key)
+            else:
+                i = 0
+            return self.titles[i:i + limit], i + limit < len(self.titles)
+
+    def initials(self):
+        """
+        Returns (first character, number of titles) pairs in sorted order.
+        """
+        with self.lock:
+            self._refresh()
+            return sorted((bucket, count) for bucket, count in self.buckets.items() if count)
+
+    def etag(self):
+        """
+        Returns a value that changes whenever the set of titles changes.
+        """
+        with self.lock:
+            self._refresh()
+            return f"{self.signature:032x}"
+
+    def last_modified(self):
+        """
+        Returns the time entries were last added or removed as a
+        timestamp, or None if it is unknown.
+        """
+        with self.lock:
+            self._refresh()
+            return self.stamp[1] if self.stamp is not None else None
+
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+
+    def add(self, title):
+        with self.lock:
+            if not self.loaded:
+                return
+            i = bisect.bisect_left(self.titles, sort_key(title), key=sort_key)
+            if i == len(self.titles) or self.titles[i] != title:
+                # Rebuilding the tuple is O(n), but saves are rare next to
+                # reads, which get the tuple without copying
+                self.titles = self.titles[:i] + (title,) + self.titles[i:]
+                self.by_lower.setdefault(title.lower(), title)
+                self.signature ^= _title_hash(title)
+                self.buckets[initial(title)] += 1
+                self._folded = None
+            # Our own write changed the stamp; don't reload because of it
+            self.stamp = self.backend.stamp()
+
+
+catalog = TitleCatalog()
+
+
+@receiver(entry_saved)
+def add_entry(sender, title, content, **kwargs):
+    catalog.add(title)
+
+
+@receiver(entries_saved)
+def reload_catalog(sender, titles, **kwargs):
+    catalog.reset()
+
+
+@receiver(setting_changed)
+def reset_catalog(setting, **kwargs):
+    if setting in STORAGE_SETTINGS:
+        catalog.reset()
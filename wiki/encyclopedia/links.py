@@ -0,0 +1,86 @@
+"""
+The link graph between entries.
+
+When an entry is saved, its outgoing /wiki/<title> links are parsed and
+its rows in the Link table replaced. Only Markdown link targets,
+reference definitions, autolinks and HTML hrefs count, relative or on
+one of ALLOWED_HOSTS (other than "*"), and nothing inside code. Both directions are indexed, so
+outgoing links and backlinks are O(degree) lookups.
+"""
+import hashlib
+import re
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+from django.http.request import validate_host
+
+from . import util
+from .models import Link
+from .signals import entries_saved, entry_saved
+
+# Matches a Markdown link target, reference definition, autolink or HTML
+# href to /wiki/<title>/, capturing the host if absolute and the title
+LINK_RE = re.compile(
+    r"""(?:\]\(|\]:[ \t]*|<|href=["'])(?:https?://([^/\s()<>"'`]+))?/wiki/([^/\s()<>"'`#?]+)""")
+
+# Fenced code blocks and code spans
+CODE_RE = re.compile(r"```.*?```|~~~.*?~~~|`[^`\n]*`", re.DOTALL)
+
+
+def _same_site(host):
+    return not host or validate_host(host, [h for h in settings.ALLOWED_HOSTS if h != "*"])
+
+
+def outgoing_titles(title, content):
+    """
+    Returns the set of titles an entry's Markdown links to.
+    """
+    targets = {unquote(target) for host, target in LINK_RE.findall(CODE_RE.sub("", content))
+               if _same_site(host)}
+    targets.discard(title)
+    return targets
+
+
+def update_links(title, content):
+    """
+    Replaces an entry's outgoing edges.
+    """
+    targets = outgoing_titles(title, content)
+    with transaction.atomic():
+        existing = set(Link.objects.filter(source=title).values_list("target", flat=True))
+        Link.objects.filter(source=title, target__in=existing - targets).delete()
+        Link.objects.bulk_create([Link(source=title, target=target) for target in targets - existing])
+
+
+def outgoing(title):
+    return list(Link.objects.filter(source=title).order_by("target").values_list("target", flat=True))
+
+
+def backlinks(title):
+    """
+    Returns the titles of entries linking to `title`.
+    """
+    return list(Link.objects.filter(target=title).order_by("source").values_list("source", flat=True))
+
+
+def backlinks_digest(title):
+    """
+    Returns a digest of an entry's backlinks, for use in its ETag.
+    """
+    return hashlib.sha256("\n".join(backlinks(title)).encode("utf-8")).hexdigest()[:16]
+
+
+@receiver(entry_saved)
+def link_entry(sender, title, content, **kwargs):
+    update_links(title, content)
+
+
+@receiver(entries_saved)
+def link_entries(sender, titles, **kwargs):
+    with transaction.atomic():
+        for title in titles:
+            content = util.get_entry(title)
+            if content is not None:
+                update_links(title, content)
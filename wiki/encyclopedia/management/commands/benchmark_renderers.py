@@ -0,0 +1,60 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encyclopedia import renderers, util
+
+
+class Command(BaseCommand):
+    help = ("Render every encyclopedia entry with each installed Markdown renderer "
+            "and report pages per second and peak memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engines", nargs="+", default=None,
+                            help="Renderers to compare (default: every installed one).")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="Render the corpus this many times and keep the best run.")
+        parser.add_argument("--output", default=None, help="Also write the results as JSON.")
+
+    def handle(self, *args, **options):
+        engines = options["engines"] or renderers.available_renderers()
+        unknown = set(engines) - set(renderers.ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown renderers: {', '.join(sorted(unknown))}")
+
+        contents = [util.get_entry(title) for title in util.list_entries()]
+        contents = [content for content in contents if content is not None]
+        total_bytes = sum(len(content.encode("utf-8")) for content in contents)
+        self.stdout.write(f"{len(contents)} entries, {total_bytes / 1024:.0f} KiB of Markdown")
+
+        results = {}
+        for name in engines:
+            render = renderers.get_renderer(name)
+            best = None
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                for content in contents:
+                    render(content)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            # Measure memory in a separate pass, tracemalloc slows rendering down
+            tracemalloc.start()
+            for content in contents:
+                render(content)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                "pages_per_second": len(contents) / best if best else None,
+                "seconds": best,
+                "peak_memory_kib": peak / 1024,
+            }
+            self.stdout.write(f"{name:<12} {results[name]['pages_per_second'] or 0:10.1f} pages/s"
+                              f"  peak {results[name]['peak_memory_kib']:8.1f} KiB")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"entries": len(contents), "bytes": total_bytes, "renderers": results}, f, indent=2)
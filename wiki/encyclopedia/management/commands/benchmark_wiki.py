@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from encyclopedia import revisions
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Corpus:
+    """
+    A reproducible synthetic wiki: pseudo-word titles, bodies drawn from a
+    fixed vocabulary, and a few /wiki/ links per entry.
+    """
+    def __init__(self, size, seed=0):
+        self.rng = random.Random(seed)
+        syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "zen", "qua", "bri", "dor"]
+        self.vocabulary = sorted({
+            "".join(self.rng.choices(syllables, k=self.rng.randint(2, 4))) for _ in range(5000)
+        })
+        titles = set()
+        while len(titles) < size:
+            titles.add(" ".join(self.rng.choices(self.vocabulary, k=self.rng.randint(1, 3))).title())
+        self.titles = sorted(titles)
+
+    def body(self, title):
+        words = self.rng.choices(self.vocabulary, k=self.rng.randint(50, 400))
+        links = [f"[{t}](/wiki/{t})" for t in self.rng.sample(self.titles, 3)]
+        paragraphs = [" ".join(words[i:i + 60]) for i in range(0, len(words), 60)]
+        return f"# {title}\n\n" + "\n\n".join(paragraphs) + "\n\nSee also: " + ", ".join(links) + "\n"
+
+    def write(self, root):
+        directory = os.path.join(root, "entries")
+        os.makedirs(directory, exist_ok=True)
+        for title in self.titles:
+            with open(os.path.join(directory, f"{title}.md"), "w", encoding="utf-8") as f:
+                f.write(self.body(title))
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the encyclopedia views against synthetic corpora and write "
+            "throughput and latency percentiles as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Corpus sizes to generate (default: 1000 10000 100000).")
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Requests per view and corpus size.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-results.json")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            results = {
+                "requests": options["requests"],
+                "seed": options["seed"],
+                "sizes": {str(size): self.run_size(size, options) for size in options["sizes"]},
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def run_size(self, size, options):
+        with tempfile.TemporaryDirectory() as root:
+            self.stdout.write(f"Generating {size} entries...")
+            corpus = Corpus(size, options["seed"])
+            corpus.write(root)
+            with override_settings(MEDIA_ROOT=root,
+                                   WIKI_ENTRY_BACKEND="file",
+                                   WIKI_CATALOG_PATH=os.path.join(root, "catalog.json"),
+                                   WIKI_SEARCH_INDEX_DIR=os.path.join(root, "search_index")):
+                return self.run_views(corpus, options["requests"])
+
+    def run_views(self, corpus, n):
+        client = Client()
+        rng = random.Random(1)
+
+        def save_edit():
+            title = rng.choice(corpus.titles)
+            return client.post(f"/save_edit/{title}/", {
+                "content": corpus.body(title),
+                "revision": revisions.current_revision(title),
+            })
+
+        views = {
+            "index": lambda: client.get("/"),
+            "search": lambda: client.get("/search/", {"q": " ".join(rng.sample(corpus.vocabulary, 2))}),
+            "entry_page": lambda: client.get(f"/wiki/{rng.choice(corpus.titles)}/"),
+            "random_page": lambda: client.get("/random/"),
+            "save_edit": save_edit,
+        }
+
+        results = {}
+        for name, request in views.items():
+            # The first request pays for loading catalogs and indexes
+            start = time.perf_counter()
+            request()
+            cold = time.perf_counter() - start
+
+            samples = []
+            for _ in range(n):
+                start = time.perf_counter()
+                response = request()
+                samples.append(time.perf_counter() - start)
+                assert response.status_code in (200, 302), (name, response.status_code)
+
+            total = sum(samples)
+            results[name] = {
+                "cold_ms": cold * 1000,
+                "throughput_rps": n / total,
+                "mean_ms": statistics.mean(samples) * 1000,
+                "p50_ms": _percentile(samples, 50) * 1000,
+                "p90_ms": _percentile(samples, 90) * 1000,
+                "p99_ms": _percentile(samples, 99) * 1000,
+                "max_ms": max(samples) * 1000,
+            }
+            self.stdout.write(f"  {len(corpus.titles):>7} {name:<12} "
+                              f"{results[name]['throughput_rps']:8.1f} req/s  "
+                              f"p50 {results[name]['p50_ms']:7.2f} ms  "
+                              f"p99 {results[name]['p99_ms']:7.2f} ms")
+        return results
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from encyclopedia import archive, util
+
+
+class Command(BaseCommand):
+    help = "Stream every encyclopedia entry into a JSONL or tar archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archive to write, or - for standard output.")
+        parser.add_argument("--format", choices=["jsonl", "tar"], default=None,
+                            help="Archive format (default: guessed from the file name, else jsonl).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or archive.guess_format(path)
+
+        def entries():
+            for title in util.list_entries():
+                content = util.get_entry(title)
+                if content is not None:
+                    yield title, content
+
+        if path == "-":
+            self._write(sys.stdout.buffer, fmt, entries(), path)
+        else:
+            with open(path, "wb") as stream:
+                self._write(stream, fmt, entries(), path)
+            self.stderr.write(self.style.SUCCESS(f"Exported entries to {path}"))
+
+    def _write(self, stream, fmt, entries, path):
+        if fmt == "tar":
+            archive.write_tar(stream, entries, path)
+        else:
+            archive.write_jsonl(stream, entries)
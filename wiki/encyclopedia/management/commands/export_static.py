@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from encyclopedia import renderers, util
+from encyclopedia.catalog import initial, sort_key
+from encyclopedia.render_cache import render_markdown
+from encyclopedia.views import SearchForm
+
+MANIFEST = "manifest.json"
+EXCERPT_LENGTH = 200
+
+
+def _setup_worker(settings_module):
+    # Needed when worker processes are spawned rather than forked
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def _page_path(output, title):
+    return os.path.join(output, "wiki", title, "index.html")
+
+
+def _render_entry(args):
+    """
+    Renders one entry to its static page. Runs in a worker process.
+    Returns (title, digest, excerpt), or None if the entry has vanished.
+    """
+    output, title = args
+    content = util.get_entry(title)
+    if content is None:
+        return None
+    html = render_markdown(content)
+    page = render_to_string("encyclopedia/entry.html", {
+        "title": title,
+        "content": html,
+        "search_form": SearchForm(),
+    })
+    path = _page_path(output, title)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+    excerpt = " ".join(strip_tags(html).split())[:EXCERPT_LENGTH]
+    return title, util.content_digest(content), excerpt
+
+
+class Command(BaseCommand):
+    help = ("Render every encyclopedia entry to a static site, using a process pool. "
+            "Only entries whose content changed since the last export are re-rendered.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Directory to write the site to.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Number of worker processes (default: one per CPU).")
+        parser.add_argument("--force", action="store_true",
+                            help="Re-render every entry, e.g. after a template change.")
+
+    def handle(self, *args, **options):
+        output = os.path.abspath(options["output"])
+        os.makedirs(output, exist_ok=True)
+        manifest_path = os.path.join(output, MANIFEST)
+
+        previous = {}
+        if os.path.exists(manifest_path) and not options["force"]:
+            with open(manifest_path, encoding="utf-8") as f:
+                previous = json.load(f)
+
+        # Work out which entries changed. An unchanged (mtime, size) skips
+        # reading the entry; otherwise the content digest decides. Pages
+        # rendered by a different renderer are always redone.
+        renderer = renderers.renderer_name()
+        manifest, pending = {}, []
+        titles = util.list_entries()
+        for title in titles:
+            stat = util.entry_modified(title)
+            stamp = stat.isoformat() if stat else None
+            old = previous.get(title)
+            if (old and old.get("renderer") == renderer
+                    and (old["modified"] == stamp or old["digest"] == util.entry_digest(title))):
+                manifest[title] = dict(old, modified=stamp)
+            else:
+                manifest[title] = {"modified": stamp, "renderer": renderer}
+                pending.append(title)
+
+        for title in set(previous) - set(titles):
+            shutil.rmtree(os.path.dirname(_page_path(output, title)), ignore_errors=True)
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=_setup_worker,
+                                     initargs=(os.environ["DJANGO_SETTINGS_MODULE"],)) as pool:
+                chunksize = max(1, len(pending) // (4 * (options["workers"] or 1)))
+                jobs = ((output, title) for title in pending)
+                for result in pool.map(_render_entry, jobs, chunksize=chunksize):
+                    if result is None:
+                        continue
+                    title, digest, excerpt = result
+                    manifest[title].update(digest=digest, excerpt=excerpt)
+        manifest = {title: entry for title, entry in manifest.items() if "digest" in entry}
+
+        entries = sorted(manifest, key=sort_key)
+        with open(os.path.join(output, "index.html"), "w", encoding="utf-8") as f:
+            f.write(render_to_string("encyclopedia/index.html", {
+                "entries": entries,
+                "initials": sorted(Counter(initial(title) for title in entries).items()),
+                "static": True,
+                "search_form": SearchForm(),
+            }))
+        with open(os.path.join(output, "search.json"), "w", encoding="utf-8") as f:
+            json.dump([{
+                "title": title,
+                "url": f"/wiki/{title}/",
+                "excerpt": entry["excerpt"],
+            } for title, entry in sorted(manifest.items())], f)
+        self._copy_static(output)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(manifest)} entries to {output} "
+            f"({len(pending)} rendered, {len(manifest) - len(pending)} unchanged)."))
+
+    def _copy_static(self, output):
+        stylesheet = finders.find("encyclopedia/styles.css")
+        if stylesheet:
+            target = os.path.join(output, settings.STATIC_URL.strip("/"), "encyclopedia")
+            os.makedirs(target, exist_ok=True)
+            shutil.copy2(stylesheet, target)
@@ -0,0 +1,62 @@
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from encyclopedia import archive, revisions, util
+
+
+class Command(BaseCommand):
+    help = ("Stream entries from a JSONL or tar archive into the encyclopedia, writing "
+            "in batches and updating caches and indexes once at the end.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archive to read, or - for standard input.")
+        parser.add_argument("--format", choices=["jsonl", "tar"], default=None,
+                            help="Archive format (default: guessed from the file name, else jsonl).")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--skip-existing", action="store_true",
+                            help="Leave entries that already exist untouched, and keep only the "
+                                 "first of any titles repeated in the archive.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or archive.guess_format(path)
+
+        if path == "-":
+            titles, skipped = self._import(sys.stdin.buffer, fmt, path, options)
+        else:
+            with open(path, "rb") as stream:
+                titles, skipped = self._import(stream, fmt, path, options)
+
+        util.entries_changed(titles)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(titles)} entries ({skipped} skipped)."))
+
+    def _import(self, stream, fmt, path, options):
+        if fmt == "tar":
+            entries = archive.read_tar(stream, path)
+        else:
+            entries = archive.read_jsonl(stream)
+
+        titles, skipped = [], 0
+        seen = set()
+        while True:
+            batch = list(islice(entries, options["batch_size"]))
+            if not batch:
+                break
+            if options["skip_existing"]:
+                kept = []
+                for title, content in batch:
+                    # Titles are matched ignoring case, like find_entry does
+                    key = title.lower()
+                    if key not in seen and util.find_entry(title) is None:
+                        kept.append((title, content))
+                    seen.add(key)
+                skipped += len(batch) - len(kept)
+                batch = kept
+            # History first, so a failed batch doesn't leave unrecorded entries
+            revisions.record_revisions(batch)
+            titles += util.save_entries(batch)
+            self.stdout.write(f"Imported {len(titles)}...")
+        return titles, skipped
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from encyclopedia.storage import FileEntryStorage, SQLiteEntryStorage, sqlite_path
+
+
+class Command(BaseCommand):
+    help = "Copy every Markdown file under entries/ into the SQLite entry database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None,
+                            help="Database file to write (default: WIKI_SQLITE_PATH).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options["path"] or sqlite_path()
+        source = FileEntryStorage()
+        target = SQLiteEntryStorage(path)
+
+        titles = source.list_titles()
+        batch_size = options["batch_size"]
+        for start in range(0, len(titles), batch_size):
+            batch = titles[start:start + batch_size]
+            target.write_many((title, source.read(title)) for title in batch)
+            self.stdout.write(f"Copied {min(start + batch_size, len(titles))}/{len(titles)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {len(titles)} entries to {path}. "
+            "Set WIKI_ENTRY_BACKEND = 'sqlite' to use it."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from encyclopedia import util
+from encyclopedia.links import outgoing_titles
+from encyclopedia.models import Link
+
+
+class Command(BaseCommand):
+    help = "Rebuild the link graph (backlinks) by parsing every encyclopedia entry."
+
+    def handle(self, *args, **options):
+        titles = util.list_entries()
+        with transaction.atomic():
+            Link.objects.all().delete()
+            for title in titles:
+                content = util.get_entry(title)
+                if content is not None:
+                    Link.objects.bulk_create([Link(source=title, target=target)
+                                              for target in outgoing_titles(title, content)])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed links from {len(titles)} entries ({Link.objects.count()} links)."))
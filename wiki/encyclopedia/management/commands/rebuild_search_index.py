@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from encyclopedia.search_index import get_index
+
+
+class Command(BaseCommand):
+    help = "Re-index every encyclopedia entry and write a fresh search index snapshot."
+
+    def handle(self, *args, **options):
+        index = get_index()
+        index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(index.docs)} entries."))
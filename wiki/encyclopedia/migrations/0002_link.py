@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encyclopedia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Link',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200)),
+                ('target', models.CharField(max_length=200)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target', 'source'], name='link_target_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'target'), name='unique_link')],
+            },
+        ),
+    ]
@@ -1,3 +1,43 @@
 from django.db import models
 
-# Create your models here.
+
+class Revision(models.Model):
+    """
+    One saved version of an entry. `data` is zlib-compressed: the full
+    text for snapshots, otherwise a delta against the previous revision
+    (see revisions.py).
+    """
+    title = models.CharField(max_length=200)
+    number = models.PositiveIntegerField()
+    snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["title", "number"]
+        constraints = [
+            models.UniqueConstraint(fields=["title", "number"], name="unique_revision_number"),
+        ]
+
+    def __str__(self):
+        return f"{self.title} r{self.number}"
+
+
+class Link(models.Model):
+    """
+    An edge of the link graph: `source` links to /wiki/<target>.
+    Kept up to date by links.py whenever an entry is saved.
+    """
+    source = models.CharField(max_length=200)
+    target = models.CharField(max_length=200)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target"], name="unique_link"),
+        ]
+        indexes = [
+            models.Index(fields=["target", "source"], name="link_target_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} -> {self.target}"
@@ -0,0 +1,118 @@
+"""
+Cache of rendered entry HTML.
+
+Rendered pages are kept in an in-process LRU keyed by title, each one
+remembering the digest of the content it was rendered from. Every lookup
+compares that with the entry's current digest (util.entry_digest, which
+is a stat() unless the entry changed), so saves in other processes and
+edits made outside the app are never served stale. If
+WIKI_RENDER_CACHE_ALIAS names a Django cache, that cache is used as a
+shared tier between processes, mapping each (renderer, digest) pair to
+its HTML.
+
+HTML is always stored under the digest of the very content it was
+rendered from, so a save that lands while a page is being rendered can't
+leave the old HTML cached for the new content.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import renderers, util
+from .signals import STORAGE_SETTINGS, entries_saved, entry_saved
+
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def _max_size():
+    return getattr(settings, "WIKI_RENDER_CACHE_SIZE", 512)
+
+
+def _shared_cache():
+    alias = getattr(settings, "WIKI_RENDER_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _html_key(digest):
+    return f"encyclopedia:html:{renderers.renderer_name()}:{digest}"
+
+
+def render_markdown(content):
+    """
+    Converts an entry's Markdown to HTML with the configured renderer.
+    """
+    return renderers.render(content)
+
+
+def _store_local(title, digest, html):
+    with _lock:
+        _local[title] = (digest, html)
+        _local.move_to_end(title)
+        while len(_local) > _max_size():
+            _local.popitem(last=False)
+
+
+def rendered_entry(title):
+    """
+    Returns the HTML for an entry, or None if the entry does not exist.
+    A hit in either tier skips both reading and converting the Markdown.
+    """
+    digest = util.entry_digest(title)
+    if digest is None:
+        return None
+
+    with _lock:
+        hit = _local.get(title)
+        if hit is not None and hit[0] == digest:
+            _local.move_to_end(title)
+            return hit[1]
+
+    shared = _shared_cache()
+    if shared:
+        html = shared.get(_html_key(digest))
+        if html is not None:
+            _store_local(title, digest, html)
+            return html
+
+    content = util.get_entry(title)
+    if content is None:
+        return None
+    # The entry may have changed since entry_digest; key on what we render
+    digest = util.content_digest(content)
+    html = render_markdown(content)
+    _store_local(title, digest, html)
+    if shared:
+        shared.set(_html_key(digest), html, timeout=None)
+    return html
+
+
+def clear():
+    """
+    Empties the in-process tier.
+    """
+    with _lock:
+        _local.clear()
+
+
+@receiver(entry_saved)
+def invalidate_entry(sender, title, content, **kwargs):
+    with _lock:
+        _local.pop(title, None)
+
+
+@receiver(entries_saved)
+def invalidate_entries(sender, titles, **kwargs):
+    with _lock:
+        for title in titles:
+            _local.pop(title, None)
+
+
+@receiver(setting_changed)
+def reset_cache(setting, **kwargs):
+    if setting in STORAGE_SETTINGS or setting == "WIKI_MARKDOWN_RENDERER":
+        clear()
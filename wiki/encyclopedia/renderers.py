@@ -0,0 +1,100 @@
+"""
+Interchangeable Markdown renderers.
+
+The engine is chosen by the WIKI_MARKDOWN_RENDERER setting. markdown2 is
+the default and the only one the wiki requires; the others are used if
+their package is installed:
+
+    "markdown2"    markdown2
+    "markdown"     Python-Markdown
+    "mistune"      mistune
+    "commonmark"   commonmark
+    "markdown-it"  markdown-it-py
+
+`python manage.py benchmark_renderers` compares them on the entries.
+"""
+import importlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_RENDERER = "markdown2"
+
+
+def _markdown2():
+    import markdown2
+    return markdown2.markdown
+
+
+def _python_markdown():
+    import markdown
+    # markdown.Markdown instances keep state between calls; use a fresh one
+    return markdown.markdown
+
+
+def _mistune():
+    import mistune
+    return mistune.create_markdown()
+
+
+def _commonmark():
+    import commonmark
+    return commonmark.commonmark
+
+
+def _markdown_it():
+    from markdown_it import MarkdownIt
+    return MarkdownIt().render
+
+
+# name -> (module that must be importable, factory returning a str -> str function)
+ENGINES = {
+    "markdown2": ("markdown2", _markdown2),
+    "markdown": ("markdown", _python_markdown),
+    "mistune": ("mistune", _mistune),
+    "commonmark": ("commonmark", _commonmark),
+    "markdown-it": ("markdown_it", _markdown_it),
+}
+
+_renderers = {}
+
+
+def available_renderers():
+    """
+    Returns the names of the engines whose package is installed.
+    """
+    names = []
+    for name, (module, _) in ENGINES.items():
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def renderer_name():
+    return getattr(settings, "WIKI_MARKDOWN_RENDERER", DEFAULT_RENDERER)
+
+
+def get_renderer(name=None):
+    """
+    Returns a function converting Markdown to HTML with the named engine,
+    or the configured one.
+    """
+    name = name or renderer_name()
+    if name not in _renderers:
+        if name not in ENGINES:
+            raise ImproperlyConfigured(
+                f"Unknown Markdown renderer '{name}'. Choose one of: {', '.join(ENGINES)}.")
+        module, factory = ENGINES[name]
+        try:
+            _renderers[name] = factory()
+        except ImportError:
+            raise ImproperlyConfigured(
+                f"Markdown renderer '{name}' needs the '{module}' package.")
+    return _renderers[name]
+
+
+def render(content):
+    return get_renderer()(content)
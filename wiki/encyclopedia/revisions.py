@@ -0,0 +1,179 @@
+"""
+Revision history for entries.
+
+Every save through save_revision() stores a Revision row. Most rows hold
+a line-based delta against the previous revision, so history grows with
+the size of each edit rather than the size of the page. Every
+SNAPSHOT_INTERVAL-th revision holds the full text instead, which bounds
+how many deltas have to be applied to rebuild any revision.
+
+A delta is a JSON list of operations turning the previous text into the
+new one, compressed with zlib:
+
+    [start, end]   copy lines start..end of the previous text
+    "text"         insert this text
+"""
+import difflib
+import json
+import zlib
+
+from django.db import IntegrityError, transaction
+
+from . import util
+from .models import Revision
+
+SNAPSHOT_INTERVAL = 20
+
+
+class EditConflict(Exception):
+    """
+    The entry was saved by someone else since the edit was started.
+    """
+    def __init__(self, title, current):
+        super().__init__(f"'{title}' has changed since revision {current} was loaded.")
+        self.title = title
+        self.current = current
+
+
+def _pack(obj):
+    return zlib.compress(json.dumps(obj).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)).decode("utf-8"))
+
+
+def make_delta(old, new):
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    return "".join(
+        "".join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in ops
+    )
+
+
+def current_revision(title):
+    """
+    Returns the latest revision number of an entry, or 0 if it has none.
+    """
+    latest = Revision.objects.filter(title=title).order_by("-number").values_list("number", flat=True).first()
+    return latest or 0
+
+
+def get_revision(title, number):
+    """
+    Rebuilds the text of an entry as of a revision, or returns None if
+    there is no such revision.
+    """
+    base = number - (number - 1) % SNAPSHOT_INTERVAL
+    rows = list(Revision.objects.filter(title=title, number__gte=base, number__lte=number)
+                .order_by("number").only("snapshot", "data"))
+    if len(rows) != number - base + 1 or not rows[0].snapshot:
+        return None
+    content = _unpack(rows[0].data)
+    for row in rows[1:]:
+        content = apply_delta(content, _unpack(row.data))
+    return content
+
+
+def history(title):
+    """
+    Returns (number, created_at) for each revision of an entry, newest first.
+    """
+    return list(Revision.objects.filter(title=title).order_by("-number")
+                .values_list("number", "created_at"))
+
+
+def _create(title, number, content, previous):
+    snapshot = previous is None or number % SNAPSHOT_INTERVAL == 1
+    Revision.objects.create(
+        title=title,
+        number=number,
+        snapshot=snapshot,
+        data=_pack(content if snapshot else make_delta(previous, content)),
+    )
+
+
+def _append(title, content, current):
+    """
+    Stores `content` as the revision after `current` and returns its number.
+    """
+    if current:
+        previous = get_revision(title, current)
+    else:
+        # Keep the text the entry had before history was recorded
+        previous = util.get_entry(title)
+        if previous is not None:
+            current += 1
+            _create(title, current, previous, None)
+    _create(title, current + 1, content, previous)
+    return current + 1
+
+
+def _write_entry(title, number, content):
+    """
+    Writes a committed revision to the entry. Saves of different revisions
+    can finish in either order, so whoever writes checks afterwards that a
+    newer revision hasn't been committed meanwhile, and writes that one if
+    it has.
+    """
+    while True:
+        util.save_entry(title, content)
+        latest = current_revision(title)
+        if latest == number:
+            return
+        number, content = latest, get_revision(title, latest)
+        if content is None:
+            return
+
+
+def save_revision(title, content, base=None, create=False):
+    """
+    Saves an entry and records it as a new revision, returning its number.
+
+    `base` is the revision the edit started from. If the entry has moved
+    on since then, EditConflict is raised and nothing is saved. Pass None
+    to save unconditionally. With `create`, the save fails with
+    EditConflict if the entry already exists.
+
+    The entry itself is written, and entry_saved sent, only once the
+    revision has been committed, so a rejected edit never reaches the page.
+    """
+    try:
+        with transaction.atomic():
+            current = current_revision(title)
+            if create and (current or util.get_entry(title) is not None):
+                raise EditConflict(title, current)
+            if base is not None and base != current:
+                raise EditConflict(title, current)
+
+            # The unique (title, number) constraint makes a concurrent save
+            # that read the same current revision fail here
+            number = _append(title, content, current)
+            transaction.on_commit(lambda: _write_entry(title, number, content))
+            return number
+    except IntegrityError:
+        raise EditConflict(title, current_revision(title))
+
+
+def record_revisions(entries):
+    """
+    Records each (title, content) pair as a new revision of its entry,
+    without writing the entries. For bulk writers like import_entries,
+    which write them afterwards with util.save_entries.
+    """
+    with transaction.atomic():
+        for title, content in entries:
+            _append(title, content, current_revision(title))
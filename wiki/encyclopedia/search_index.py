@@ -0,0 +1,482 @@
+"""
+Full-text search over entry titles and bodies.
+
+The index is an inverted index scored with BM25. Entries are numbered
+and each term maps to two arrays, the numbers of the entries it occurs
+in and its frequency in each. It lives in memory and is persisted under
+WIKI_SEARCH_INDEX_DIR as a snapshot plus an append-only journal:
+
+    snapshot.bin    the index as of the last compaction: a JSON line
+                    {"generation": id, "titles": [title, ...],
+                     "lengths": [length, ...], "terms": [[term, count], ...]}
+                    then, per term in that order, its docs and its tfs as
+                    little-endian uint32 arrays, where doc indexes titles
+    journal.jsonl   a {"generation": id} header, then one line per saved
+                    entry since that compaction
+    index.lock      flock()ed around every read (shared) and write
+                    (exclusive) of the two
+
+An entry that is saved again gets a new number and its old one is only
+marked dead, so memory holds nothing per entry beyond its title and
+length. Dead postings are dropped once they are a fifth of the index,
+and on compaction.
+
+util.save_entry appends to the journal, so a restart only replays the
+journal instead of re-reading every entry. Other processes pick up
+journal lines on their next query; a query whose journal hasn't changed
+since the last one (by stat) takes no file lock at all, and scoring
+never holds it. Compacting starts a new generation; a process whose
+generation no longer matches the journal header reloads the snapshot
+instead of replaying from its old offset, and compaction replays the
+journal before writing the snapshot so no other process's lines are
+lost.
+
+Backends with their own full-text search (see storage.py) answer
+queries themselves and this index is not maintained.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import threading
+import uuid
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from operator import itemgetter
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in one process are serialized
+    fcntl = None
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import util
+from .signals import STORAGE_SETTINGS, entries_saved, entry_saved
+from .storage import get_backend
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times towards a document's term frequency
+TITLE_WEIGHT = 3
+
+# Compact on load once the journal is longer than this
+JOURNAL_LIMIT = 1000
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def document_terms(title, content):
+    """
+    Returns the term frequencies for an entry.
+    """
+    terms = Counter(tokenize(content))
+    for term in tokenize(title):
+        terms[term] += TITLE_WEIGHT
+    return terms
+
+
+def _uint32_array(data):
+    body = array("I")
+    body.frombytes(data)
+    if sys.byteorder == "big":
+        body.byteswap()
+    return body
+
+
+def _index_dir():
+    return getattr(settings, "WIKI_SEARCH_INDEX_DIR",
+                   os.path.join(settings.BASE_DIR, "search_index"))
+
+
+class SearchIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self.lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._lock_shared = False
+        self._clear()
+        self.generation = None
+        self.journal_offset = 0
+        self.journal_lines = 0
+        self.journal_stat = None
+        self.loaded = False
+
+    @contextmanager
+    def _locked(self, shared=False):
+        """
+        Holds the thread lock and a lock on index.lock, exclusive unless
+        `shared`, so other processes don't append, compact or read halfway
+        through. Re-entrant within this instance, but a shared lock can't
+        be taken exclusively from inside.
+        """
+        with self.lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self._lock_file = open(self.lock_path, "a+b")
+                self._lock_shared = shared
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            elif self._lock_shared and not shared:
+                raise RuntimeError("the index lock is held shared")
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    # -- in-memory updates -------------------------------------------------
+
+    def _clear(self):
+        self.docs = {}  # title -> doc
+        self.titles = []  # doc -> title, None once dead
+        self.lengths = array("I")
+        self.postings = {}  # term -> (docs, tfs)
+        self.total_length = 0
+        self.dead = 0
+
+    def _remove(self, title):
+        doc = self.docs.pop(title, None)
+        if doc is None:
+            return
+        self.titles[doc] = None
+        self.total_length -= self.lengths[doc]
+        self.dead += 1
+
+    def _add(self, title, terms):
+        self._remove(title)
+        doc = len(self.titles)
+        length = sum(terms.values())
+        self.docs[title] = doc
+        self.titles.append(title)
+        self.lengths.append(length)
+        self.total_length += length
+        for term, tf in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("I"))
+            posting[0].append(doc)
+            posting[1].append(tf)
+        if self.dead * 4 > len(self.docs):
+            self._purge()
+
+    def _purge(self):
+        """
+        Drops dead entries' postings and renumbers the live entries.
+        """
+        titles = self.titles
+        live = [doc for doc, title in enumerate(titles) if title is not None]
+        renumber = {doc: new for new, doc in enumerate(live)}
+        for term, (docs, tfs) in list(self.postings.items()):
+            kept = [(renumber[doc], tf) for doc, tf in zip(docs, tfs) if titles[doc] is not None]
+            if kept:
+                self.postings[term] = (array("I", [doc for doc, _ in kept]), array("I", [tf for _, tf in kept]))
+            else:
+                del self.postings[term]
+        self.titles = [titles[doc] for doc in live]
+        self.lengths = array("I", [self.lengths[doc] for doc in live])
+        self.docs = {title: doc for doc, title in enumerate(self.titles)}
+        self.dead = 0
+
+    # -- persistence -------------------------------------------------------
+
+    def load(self):
+        """
+        Loads the snapshot and journal, builds the index from scratch if
+        there is none, and reconciles it with the entries on disk.
+        """
+        with self._locked():
+            if not self._load_snapshot():
+                self.rebuild()
+                return
+            self._replay_journal()
+            self.loaded = True
+
+            titles = set(util.list_entries())
+            for title in set(self.docs) - titles:
+                self._remove(title)
+            missing = titles - set(self.docs)
+            for title in missing:
+                content = util.get_entry(title)
+                if content is not None:
+                    self._add(title, document_terms(title, content))
+            if missing or self.journal_lines > JOURNAL_LIMIT:
+                self.compact()
+
+    def _load_snapshot(self):
+        """
+        Replaces the in-memory index with the snapshot. Returns False if
+        there is no usable snapshot.
+        """
+        self._clear()
+        self.generation = None
+        self.journal_offset = self.journal_lines = 0
+        self.journal_stat = None
+        if not os.path.exists(self.snapshot_path):
+            return False
+        with open(self.snapshot_path, "rb") as f:
+            data = json.loads(f.readline())
+            body = _uint32_array(f.read())
+        self.titles = data["titles"]
+        self.docs = {title: doc for doc, title in enumerate(self.titles)}
+        self.lengths = array("I", data["lengths"])
+        self.total_length = sum(self.lengths)
+        offset = 0
+        for term, count in data["terms"]:
+            self.postings[term] = (body[offset:offset + count], body[offset + count:offset + 2 * count])
+            offset += 2 * count
+        self.generation = data["generation"]
+        return True
+
+    def _journal_generation(self, f):
+        """
+        Reads the journal header and returns (generation, header length).
+        """
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return None, 0
+        return json.loads(header).get("generation"), len(header)
+
+    def _journal_unchanged(self):
+        """
+        Whether the journal is the one we last replayed to its end. Its
+        inode changes when it is replaced and its size and mtime when it
+        is appended to, so no lock is needed to tell.
+        """
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return False
+        return (st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns) == self.journal_stat
+
+    def _replay_journal(self):
+        """
+        Applies journal lines appended since the last call. The caller
+        holds the file lock; if it is shared and catching up would mean
+        rewriting the index, returns False without doing so.
+        """
+        if not os.path.exists(self.journal_path):
+            return True
+        with open(self.journal_path, "rb") as f:
+            generation, header_length = self._journal_generation(f)
+            if generation != self.generation:
+                # Compacted by another process since we loaded; our offset
+                # means nothing in the new journal
+                if not self._load_snapshot():
+                    if self._lock_shared:
+                        return False
+                    self.rebuild()
+                    return True
+                f.seek(0)
+                generation, header_length = self._journal_generation(f)
+                if generation != self.generation:
+                    # Interrupted compaction: the snapshot already holds
+                    # everything the old journal did
+                    if self._lock_shared:
+                        return False
+                    self._start_journal(self.generation)
+                    return True
+            f.seek(max(self.journal_offset, header_length))
+            self.journal_offset = max(self.journal_offset, header_length)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Partially written, pick it up next time
+                    break
+                record = json.loads(line)
+                self._add(record["title"], record["terms"])
+                self.journal_offset += len(line)
+                self.journal_lines += 1
+            self._remember_journal(f.fileno())
+        return True
+
+    def _remember_journal(self, fd):
+        st = os.fstat(fd)
+        if st.st_size == self.journal_offset:
+            self.journal_stat = (st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns)
+        else:
+            self.journal_stat = None
+
+    def compact(self):
+        """
+        Folds the journal into a new snapshot and starts a new generation
+        with an empty journal.
+        """
+        with self._locked():
+            if self.generation is not None:
+                # Take in what other processes appended before discarding it
+                self._replay_journal()
+            if self.dead:
+                self._purge()
+            generation = uuid.uuid4().hex
+            header = {
+                "generation": generation,
+                "titles": self.titles,
+                "lengths": self.lengths.tolist(),
+                "terms": [[term, len(docs)] for term, (docs, _) in self.postings.items()],
+            }
+            body = array("I")
+            for docs, tfs in self.postings.values():
+                body += docs
+                body += tfs
+            if sys.byteorder == "big":
+                body.byteswap()
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+                f.write(body.tobytes())
+            os.replace(tmp_path, self.snapshot_path)
+            self._start_journal(generation)
+
+    def _start_journal(self, generation):
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps({"generation": generation}).encode("utf-8") + b"\n")
+        os.replace(tmp_path, self.journal_path)
+        self.generation = generation
+        self.journal_lines = 0
+        with open(self.journal_path, "rb") as f:
+            self.journal_offset = os.fstat(f.fileno()).st_size
+            self._remember_journal(f.fileno())
+
+    def rebuild(self):
+        """
+        Re-indexes every entry and writes a fresh snapshot.
+        """
+        with self._locked():
+            self._clear()
+            self.generation = None
+            for title in util.list_entries():
+                content = util.get_entry(title)
+                if content is not None:
+                    self._add(title, document_terms(title, content))
+            self.compact()
+            self.loaded = True
+
+    def update(self, title, content):
+        """
+        Records a saved entry in the journal and, if loaded, in memory.
+        """
+        terms = document_terms(title, content)
+        with self._locked():
+            if not os.path.exists(self.journal_path):
+                # No index on disk yet; the first load indexes every entry anyway
+                if self.loaded:
+                    self._add(title, terms)
+                    self.compact()
+                return
+            with open(self.journal_path, "ab") as f:
+                f.write(json.dumps({"title": title, "terms": terms}).encode("utf-8") + b"\n")
+            if self.loaded:
+                self._replay_journal()
+
+    def update_many(self, titles):
+        """
+        Re-indexes the given entries and writes a fresh snapshot.
+        """
+        with self._locked():
+            if not self.loaded:
+                # load() reconciles with the entries and indexes new ones
+                self.load()
+            else:
+                self._replay_journal()
+            for title in titles:
+                content = util.get_entry(title)
+                if content is not None:
+                    self._add(title, document_terms(title, content))
+            self.compact()
+
+    # -- queries -----------------------------------------------------------
+
+    def search(self, query, limit=50):
+        """
+        Returns up to `limit` entry titles ranked by BM25 score.
+        """
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            elif not self._journal_unchanged():
+                with self._locked(shared=True):
+                    caught_up = self._replay_journal()
+                if not caught_up:
+                    with self._locked():
+                        self._replay_journal()
+
+            n = len(self.docs)
+            if not n:
+                return []
+            titles, lengths = self.titles, self.lengths
+            # tf / (tf + K1 * (1 - B + B * length / avg_length)), split up
+            norm, per_length = K1 * (1 - B), K1 * B * n / self.total_length if self.total_length else 0
+            scores = Counter()
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                docs, tfs = posting
+                # Dead postings still count towards the document frequency
+                # until purged, which skews it by at most a fifth
+                df = min(len(docs), n)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (K1 + 1)
+                for doc, tf in zip(docs, tfs):
+                    if titles[doc] is not None:
+                        scores[doc] += idf * tf / (tf + norm + per_length * lengths[doc])
+            return [titles[doc] for doc, _ in heapq.nlargest(limit, scores.items(), key=itemgetter(1))]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex(_index_dir())
+        return _index
+
+
+def search(query, limit=50):
+    backend = get_backend()
+    if backend.supports_search:
+        return backend.search(query, limit)
+    return get_index().search(query, limit)
+
+
+@receiver(entry_saved)
+def index_entry(sender, title, content, **kwargs):
+    if not get_backend().supports_search:
+        get_index().update(title, content)
+
+
+@receiver(entries_saved)
+def index_entries(sender, titles, **kwargs):
+    if not get_backend().supports_search:
+        get_index().update_many(titles)
+
+
+@receiver(setting_changed)
+def reset_index(setting, **kwargs):
+    global _index
+    if setting in STORAGE_SETTINGS:
+        with _index_lock:
+            _index = None
@@ -0,0 +1,21 @@
+from django.dispatch import Signal
+
+# Sent by util.save_entry after an entry has been written.
+# Arguments: title, content.
+entry_saved = Signal()
+
+# Sent once after a bulk write through util.save_entries/entries_changed,
+# instead of entry_saved per entry. Arguments: titles.
+entries_saved = Signal()
+
+# Settings that point the wiki at a different set of entries. Module-level
+# caches reset themselves when one of these changes (e.g. under
+# override_settings), see the setting_changed receivers.
+STORAGE_SETTINGS = {
+    "MEDIA_ROOT",
+    "WIKI_ENTRY_BACKEND",
+    "WIKI_SQLITE_PATH",
+    "WIKI_CATALOG_PATH",
+    "WIKI_SEARCH_INDEX_DIR",
+    "WIKI_RENDER_CACHE_ALIAS",
+}
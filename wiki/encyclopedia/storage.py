@@ -0,0 +1,216 @@
+"""
+Storage backends for encyclopedia entries.
+
+util.list_entries, get_entry and save_entry go through the backend named
+by the WIKI_ENTRY_BACKEND setting:
+
+    "file"    one Markdown file per entry under entries/ (the default)
+    "sqlite"  a single SQLite database at WIKI_SQLITE_PATH, with an FTS5
+              index over titles and content
+
+Besides reading and writing, a backend reports per-entry metadata
+(`stat`) and a change stamp for the set of titles (`stamp`), so callers
+can notice changes without listing every entry.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .signals import STORAGE_SETTINGS
+
+
+class FileEntryStorage:
+    supports_search = False
+
+    def __init__(self, storage=default_storage, directory="entries"):
+        self.storage = storage
+        self.directory = directory
+
+    def _filename(self, title):
+        return f"{self.directory}/{title}.md"
+
+    def list_titles(self):
+        _, filenames = self.storage.listdir(self.directory)
+        return sorted(re.sub(r"\.md$", "", filename)
+                      for filename in filenames if filename.endswith(".md"))
+
+    def read(self, title):
+        try:
+            with self.storage.open(self._filename(title)) as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def write(self, title, content):
+        filename = self._filename(title)
+        if self.storage.exists(filename):
+            self.storage.delete(filename)
+        self.storage.save(filename, ContentFile(content))
+
+    def write_many(self, entries):
+        for title, content in entries:
+            self.write(title, content)
+
+    def stat(self, title):
+        """
+        Returns (last modified, size) for an entry, or None.
+        """
+        filename = self._filename(title)
+        try:
+            return self.storage.get_modified_time(filename), self.storage.size(filename)
+        except (FileNotFoundError, NotImplementedError):
+            return None
+
+    def stamp(self):
+        """
+        Returns (token, timestamp) where token changes whenever entries are
+        added or removed, or None if that can't be told cheaply.
+        """
+        try:
+            mtime_ns = os.stat(self.storage.path(self.directory)).st_mtime_ns
+        except (NotImplementedError, OSError):
+            return None
+        return mtime_ns, mtime_ns / 1e9
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    title TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    modified REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog_stamp (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+INSERT OR IGNORE INTO catalog_stamp (id, version, modified) VALUES (1, 0, 0);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    title, content, content='entries', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, title, content) VALUES (new.rowid, new.title, new.content);
+    UPDATE catalog_stamp SET version = version + 1, modified = new.modified;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+    UPDATE catalog_stamp SET version = version + 1,
+        modified = (julianday('now') - 2440587.5) * 86400.0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+    INSERT INTO entries_fts (rowid, title, content) VALUES (new.rowid, new.title, new.content);
+END;
+"""
+
+UPSERT = """
+INSERT INTO entries (title, content, modified) VALUES (?, ?, ?)
+ON CONFLICT (title) DO UPDATE SET content = excluded.content, modified = excluded.modified
+"""
+
+
+def _fts_query(query):
+    # Quote every word so user input can't use FTS5 query syntax, and
+    # match any of them like the built-in index does
+    words = re.findall(r"\w+", query)
+    return " OR ".join('"' + word + '"' for word in words)
+
+
+class SQLiteEntryStorage:
+    supports_search = True
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def list_titles(self):
+        rows = self._connection().execute("SELECT title FROM entries")
+        return sorted(title for title, in rows)
+
+    def read(self, title):
+        row = self._connection().execute(
+            "SELECT content FROM entries WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def write(self, title, content):
+        self.write_many([(title, content)])
+
+    def write_many(self, entries):
+        now = datetime.now(timezone.utc).timestamp()
+        with self._connection() as conn:
+            conn.executemany(UPSERT, ((title, content, now) for title, content in entries))
+
+    def stat(self, title):
+        row = self._connection().execute(
+            "SELECT modified, length(CAST(content AS BLOB)) FROM entries WHERE title = ?",
+            (title,)).fetchone()
+        if row is None:
+            return None
+        return datetime.fromtimestamp(row[0], tz=timezone.utc), row[1]
+
+    def stamp(self):
+        return self._connection().execute(
+            "SELECT version, modified FROM catalog_stamp").fetchone()
+
+    def search(self, query, limit=50):
+        """
+        Returns up to `limit` titles ranked by FTS5's BM25, with title
+        matches weighted above content matches.
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+        rows = self._connection().execute(
+            "SELECT title FROM entries_fts WHERE entries_fts MATCH ? "
+            "ORDER BY bm25(entries_fts, 3.0, 1.0) LIMIT ?", (match, limit))
+        return [title for title, in rows]
+
+
+def sqlite_path():
+    return getattr(settings, "WIKI_SQLITE_PATH", os.path.join(settings.BASE_DIR, "entries.sqlite3"))
+
+
+BACKENDS = {
+    "file": lambda: FileEntryStorage(),
+    "sqlite": lambda: SQLiteEntryStorage(sqlite_path()),
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the backend selected by WIKI_ENTRY_BACKEND.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[getattr(settings, "WIKI_ENTRY_BACKEND", "file")]()
+        return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting in STORAGE_SETTINGS:
+        with _backend_lock:
+            _backend = None
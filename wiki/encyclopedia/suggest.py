@@ -0,0 +1,178 @@
+"""
+As-you-type title suggestions.
+
+Prefix matches come from the title catalog, which is already sorted.
+When there are fewer than asked for, the rest are filled with titles
+similar to the query, which tolerates typos ("pyhton" -> "Python").
+
+Fuzzy matching works on the words in titles, of which there are far
+fewer than titles. Each indexed word is also filed under every spelling
+with one letter deleted, so the words one typo away from a query word
+(a letter dropped, added, changed or two swapped) are a handful of dict
+lookups, however common the word's letters; words it is a prefix of come
+from a sorted list of them. Titles containing a match for every query
+word (or failing that, for the one matching fewest titles) are ranked by
+the Jaccard similarity of their trigrams and the query's.
+
+The index is built from the title catalog on first use and extended by
+the entry_saved signal. If the catalog changes underneath it, only the
+titles added or removed since are re-indexed.
+"""
+import bisect
+import heapq
+import re
+import threading
+from itertools import islice
+
+from django.dispatch import receiver
+
+from .catalog import catalog
+from .signals import entry_saved
+
+# Lowest Jaccard similarity of trigram sets for a fuzzy match
+MIN_SCORE = 0.2
+
+# Indexed words tried for each query word, by similarity and as prefixes
+SIMILAR_WORDS = 3
+
+# Titles scored per query
+MAX_CANDIDATES = 500
+
+WORD_RE = re.compile(r"\w+")
+
+
+def trigrams(text):
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def words(text):
+    return set(WORD_RE.findall(text.lower()))
+
+
+def deletions(word):
+    """
+    Returns `word` and its spellings with one letter deleted.
+    """
+    variants = {word[:i] + word[i + 1:] for i in range(len(word))} if len(word) > 1 else set()
+    variants.add(word)
+    return variants
+
+
+def _jaccard(grams, other):
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared)
+
+
+class Suggester:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.gram_sets = {}  # title -> its trigrams
+        self.words = {}  # word -> titles containing it
+        self.variants = {}  # word with up to one letter deleted -> words
+        self.sorted_words = []
+        self.etag = None
+
+    def _index(self, title, keep_sorted=True):
+        self.gram_sets[title] = trigrams(title)
+        for word in words(title):
+            titles = self.words.get(word)
+            if titles is None:
+                titles = self.words[word] = set()
+                for variant in deletions(word):
+                    self.variants.setdefault(variant, set()).add(word)
+                if keep_sorted:
+                    bisect.insort(self.sorted_words, word)
+                else:
+                    self.sorted_words.append(word)
+            titles.add(title)
+
+    def _unindex(self, title):
+        del self.gram_sets[title]
+        for word in words(title):
+            titles = self.words[word]
+            titles.discard(title)
+            if titles:
+                continue
+            del self.words[word]
+            for variant in deletions(word):
+                spellings = self.variants[variant]
+                spellings.discard(word)
+                if not spellings:
+                    del self.variants[variant]
+            del self.sorted_words[bisect.bisect_left(self.sorted_words, word)]
+
+    def _refresh(self):
+        etag = catalog.etag()
+        if etag != self.etag:
+            titles = set(catalog.all())
+            for title in self.gram_sets.keys() - titles:
+                self._unindex(title)
+            added = titles - self.gram_sets.keys()
+            if len(added) > len(self.sorted_words):
+                # Building from scratch: one sort beats an insort per word
+                for title in added:
+                    self._index(title, keep_sorted=False)
+                self.sorted_words.sort()
+            else:
+                for title in added:
+                    self._index(title)
+            self.etag = etag
+
+    def add(self, title):
+        with self.lock:
+            if self.etag is None or title in self.gram_sets:
+                return
+            self._index(title)
+            self.etag = catalog.etag()
+
+    def similar_words(self, word, limit=SIMILAR_WORDS):
+        """
+        Returns up to `limit` indexed words one typo away from `word`, most
+        similar first, then up to `limit` that it is a prefix of.
+        """
+        grams = trigrams(word)
+        spellings = set().union(*(self.variants.get(variant, ()) for variant in deletions(word)))
+        scored = [(_jaccard(grams, trigrams(spelling)), spelling) for spelling in spellings]
+        similar = [spelling for score, spelling in heapq.nlargest(limit, scored) if score >= MIN_SCORE]
+        if len(word) >= 3:
+            i = bisect.bisect_right(self.sorted_words, word)
+            similar += [longer for longer in self.sorted_words[i:i + limit] if longer.startswith(word)]
+        return similar
+
+    def fuzzy(self, query, limit, exclude=()):
+        matching = []
+        for word in words(query):
+            titles = set().union(*(self.words[similar] for similar in self.similar_words(word)))
+            if titles:
+                matching.append(titles)
+        if not matching:
+            return []
+        candidates = set.intersection(*matching) or min(matching, key=len)
+        candidates.difference_update(exclude)
+
+        grams = trigrams(query)
+        scored = [(_jaccard(grams, self.gram_sets[title]), title) for title in islice(candidates, MAX_CANDIDATES)]
+        return [title for score, title in heapq.nlargest(limit, scored) if score >= MIN_SCORE]
+
+    def suggest(self, query, limit=10):
+        """
+        Returns up to `limit` titles: prefix matches first, then fuzzy ones.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        with self.lock:
+            self._refresh()
+            matches = catalog.prefixed(query, limit)
+            if len(matches) < limit and len(query) >= 3:
+                matches += self.fuzzy(query, limit - len(matches), exclude=set(matches))
+            return matches
+
+
+suggester = Suggester()
+
+
+@receiver(entry_saved)
+def add_entry(sender, title, content, **kwargs):
+    suggester.add(title)
@@ -1,3 +1,515 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import links, render_cache, renderers, revisions, util
+from .catalog import TitleCatalog
+from .storage import SQLiteEntryStorage
+from .models import Revision
+from . import search_index
+from .search_index import SearchIndex
+from .suggest import Suggester
+
+
+class WikiTestCase(TestCase):
+    """
+    Runs each test against an empty entries directory and search index in
+    a temporary directory.
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, "entries"))
+        self.index_dir = os.path.join(self.root, "search_index")
+        overrides = override_settings(
+            MEDIA_ROOT=self.root,
+            WIKI_ENTRY_BACKEND="file",
+            WIKI_SEARCH_INDEX_DIR=self.index_dir,
+            WIKI_SQLITE_PATH=os.path.join(self.root, "entries.sqlite3"),
+            WIKI_CATALOG_PATH=os.path.join(self.root, "catalog.json"),
+            WIKI_RENDER_CACHE_ALIAS=None,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def write_file(self, title, content):
+        """
+        Writes an entry behind the app's back, as an editor on the server would.
+        """
+        with open(os.path.join(self.root, "entries", f"{title}.md"), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+class CatalogTests(WikiTestCase):
+    def setUp(self):
+        super().setUp()
+        for title in ["Python", "Django", "pytest"]:
+            self.write_file(title, "")
+
+    def test_saved_listing_is_reused(self):
+        self.assertEqual(TitleCatalog().all(), ("Django", "pytest", "Python"))
+        fresh = TitleCatalog()
+        with mock.patch.object(fresh.backend, "list_titles") as list_titles:
+            self.assertEqual(fresh.all(), ("Django", "pytest", "Python"))
+        list_titles.assert_not_called()
+
+    def test_stale_listing_is_ignored(self):
+        TitleCatalog().all()
+        os.remove(os.path.join(self.root, "entries", "Django.md"))
+        self.assertEqual(TitleCatalog().all(), ("pytest", "Python"))
+
+    def test_prefix_ignores_case(self):
+        self.assertEqual(util.entries_starting_with("PY"), ["pytest", "Python"])
+        self.assertEqual(util.entries_starting_with("pyth", limit=1), ["Python"])
+        self.assertEqual(util.entries_starting_with("x"), [])
+
+    def test_pages_and_initials_ignore_case(self):
+        for title in ["apple", "Banana", "zebra"]:
+            self.write_file(title, "")
+        util.save_entry("Apricot", "")
+        self.assertEqual(util.list_entries(),
+                         ("apple", "Apricot", "Banana", "Django", "pytest", "Python", "zebra"))
+        self.assertEqual(util.entry_initials(), [("A", 2), ("B", 1), ("D", 1), ("P", 2), ("Z", 1)])
+        self.assertEqual(util.page_entries(start="b", limit=2), (("Banana", "Django"), True))
+        self.assertEqual(util.page_entries(after="pytest", limit=2), (("Python", "zebra"), False))
+
+    def test_index_streams_every_title_with_all(self):
+        for title in ["apple", "Banana", "C&C"]:
+            self.write_file(title, "")
+        with mock.patch("encyclopedia.views.STREAM_CHUNK_SIZE", 2):
+            response = self.client.get(reverse("encyclopedia:index"), {"all": "1"})
+            self.assertTrue(response.streaming)
+            page = b"".join(response.streaming_content).decode("utf-8")
+        self.assertNotIn("<!-- entries -->", page)
+        for title in ["apple", "Banana", "C&amp;C", "Django", "pytest", "Python"]:
+            self.assertEqual(page.count(f">{title}</a>"), 1, title)
+
+    def test_search_lists_titles_with_the_prefix(self):
+        response = self.client.get(reverse("encyclopedia:search"), {"q": "pyt"})
+        self.assertEqual(response.context["results"], ["pytest", "Python"])
+
+    def test_search_falls_back_to_titles_containing_the_query(self):
+        response = self.client.get(reverse("encyclopedia:search"), {"q": "ython"})
+        self.assertEqual(response.context["results"], ["Python"])
+        self.assertEqual(util.entries_containing("T"), ["pytest", "Python"])
+        self.assertEqual(util.entries_containing("t", limit=1), ["pytest"])
+        self.assertEqual(util.entries_containing("jango"), ["Django"])
+        self.assertEqual(util.entries_containing("x"), [])
+
+
+class SuggestTests(WikiTestCase):
+    def test_prefix_then_fuzzy(self):
+        for title in ["Python", "Django", "Pyramid"]:
+            self.write_file(title, "")
+        suggester = Suggester()
+        self.assertEqual(suggester.suggest("py"), ["Pyramid", "Python"])
+        self.assertEqual(suggester.suggest("pyhton"), ["Python"])
+        self.assertEqual(suggester.suggest("zzz"), [])
+
+    def test_fuzzy_skips_titles_sharing_only_common_trigrams(self):
+        for n in range(300):
+            self.write_file(f"The Entry {n}", "")
+        self.write_file("Thermodynamics", "")
+        suggester = Suggester()
+        suggester.suggest("x")
+
+        class CountingDict(dict):
+            lookups = 0
+
+            def __getitem__(self, key):
+                CountingDict.lookups += 1
+                return super().__getitem__(key)
+
+        suggester.gram_sets = CountingDict(suggester.gram_sets)
+        self.assertEqual(suggester.fuzzy("thermodinamics", 10), ["Thermodynamics"])
+        # Only the title with a word one typo away is scored
+        self.assertEqual(CountingDict.lookups, 1)
+
+    def test_partial_words_match_by_prefix(self):
+        for title in ["Laws of Thermodynamics", "Django"]:
+            self.write_file(title, "")
+        self.assertEqual(Suggester().suggest("thermodyn"), ["Laws of Thermodynamics"])
+
+    def test_catalog_changes_are_applied_incrementally(self):
+        for title in ["Python", "Django"]:
+            self.write_file(title, "")
+        suggester = Suggester()
+        self.assertEqual(suggester.suggest("pyhton"), ["Python"])
+        os.remove(os.path.join(self.root, "entries", "Python.md"))
+        self.write_file("Pyramid", "")
+        # Bump the directory's mtime so the catalog notices
+        os.utime(os.path.join(self.root, "entries"), ns=(1, 1))
+        with mock.patch.object(suggester, "_index", wraps=suggester._index) as index:
+            self.assertEqual(suggester.suggest("pyrmaid"), ["Pyramid"])
+        self.assertEqual([call.args[0] for call in index.call_args_list], ["Pyramid"])
+        self.assertEqual(suggester.suggest("pyhton"), [])
+
+
+class RenderCacheTests(WikiTestCase):
+    def setUp(self):
+        super().setUp()
+        render_cache.clear()
+        self.addCleanup(render_cache.clear)
+
+    def test_hit_skips_rendering(self):
+        util.save_entry("Page", "# Title")
+        with mock.patch.object(render_cache, "render_markdown", wraps=render_cache.render_markdown) as render:
+            self.assertIn("<h1>Title</h1>", render_cache.rendered_entry("Page"))
+            self.assertIn("<h1>Title</h1>", render_cache.rendered_entry("Page"))
+        self.assertEqual(render.call_count, 1)
+        self.assertIsNone(render_cache.rendered_entry("Missing"))
+
+    def test_edit_outside_the_app_is_noticed(self):
+        util.save_entry("Page", "# Old")
+        render_cache.rendered_entry("Page")
+        self.write_file("Page", "# Edited by hand")
+        self.assertIn("Edited by hand", render_cache.rendered_entry("Page"))
+
+    def test_save_during_render_is_not_cached_as_current(self):
+        util.save_entry("Page", "# Old")
+
+        def render_and_save(content):
+            # Another request saves while this one is converting the old text
+            util.save_entry("Page", "# New version")
+            return f"rendered {content}"
+
+        with mock.patch.object(render_cache, "render_markdown", side_effect=render_and_save):
+            self.assertEqual(render_cache.rendered_entry("Page"), "rendered # Old")
+        self.assertIn("New version", render_cache.rendered_entry("Page"))
+
+
+class SearchIndexTests(WikiTestCase):
+    def setUp(self):
+        super().setUp()
+        util.save_entry("Python", "A programming language with indentation.")
+        util.save_entry("Django", "A web framework written in Python.")
+
+    def test_ranks_title_matches_first(self):
+        index = SearchIndex(self.index_dir)
+        self.assertEqual(index.search("python"), ["Python", "Django"])
+        self.assertEqual(index.search("framework"), ["Django"])
+        self.assertEqual(index.search("nothing"), [])
+
+    def test_second_instance_replays_journal(self):
+        first = SearchIndex(self.index_dir)
+        second = SearchIndex(self.index_dir)
+        first.search("python")
+        second.search("python")
+
+        first.update("Git", "A version control system.")
+        self.assertEqual(second.search("version"), ["Git"])
+
+    def test_concurrent_compaction(self):
+        for title in ["Git", "HTML", "CSS"]:
+            self.write_file(title, "")
+        first = SearchIndex(self.index_dir)
+        second = SearchIndex(self.index_dir)
+        first.search("python")
+        second.search("python")
+
+        # The second process appends, then the first compacts without having
+        # replayed that line...
+        second.update("Git", "A version control system.")
+        first.update("HTML", "Markup for web pages.")
+        first.compact()
+        # ...and the journal grows past the second's old offset
+        first.update("CSS", "Style sheets for web pages and more, written at some length to pad the journal.")
+
+        self.assertEqual(second.search("version"), ["Git"])
+        self.assertEqual(set(second.search("web pages")), {"HTML", "CSS", "Django"})
+        self.assertEqual(SearchIndex(self.index_dir).search("version"), ["Git"])
+
+    def test_resaved_entries_are_purged(self):
+        index = SearchIndex(self.index_dir)
+        index.search("python")
+        for n in range(10):
+            index.update("Django", f"Revision {n} of a web framework.")
+        self.assertEqual(index.search("revision"), ["Django"])
+        self.assertEqual(index.search("indentation"), ["Python"])
+        self.assertLess(len(index.titles), 4)
+
+        index.compact()
+        self.assertEqual(index.titles, ["Python", "Django"])
+        self.assertEqual(SearchIndex(self.index_dir).search("framework"), ["Django"])
+
+    @skipIf(search_index.fcntl is None, "needs flock()")
+    def test_searches_lock_shared_and_only_when_the_journal_changed(self):
+        index = SearchIndex(self.index_dir)
+        index.search("python")
+        SearchIndex(self.index_dir).update("Git", "A version control system.")
+        with mock.patch.object(search_index.fcntl, "flock", wraps=search_index.fcntl.flock) as flock:
+            self.assertEqual(index.search("version"), ["Git"])
+            self.assertEqual(index.search("version"), ["Git"])
+        fcntl = search_index.fcntl
+        self.assertEqual([call.args[1] for call in flock.call_args_list], [fcntl.LOCK_SH, fcntl.LOCK_UN])
+
+    def test_legacy_snapshot_is_rebuilt(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, "snapshot.json"), "w") as f:
+            f.write('{"Stale": [1, {"stale": 1}]}')
+        with open(os.path.join(self.index_dir, "journal.jsonl"), "w") as f:
+            f.write('{"title": "Stale", "terms": {"stale": 1}}\n')
+        index = SearchIndex(self.index_dir)
+        self.assertEqual(index.search("stale"), [])
+        self.assertEqual(index.search("indentation"), ["Python"])
+
+
+class ConditionalGetTests(WikiTestCase):
+    def test_entry_page_etag(self):
+        util.save_entry("Python", "A language.")
+        url = reverse("encyclopedia:entry", kwargs={"title": "Python"})
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A new backlink changes the page without touching the entry
+        util.save_entry("Django", "Written in [Python](/wiki/Python).")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_index_etag_changes_with_the_titles(self):
+        util.save_entry("Python", "A language.")
+        url = reverse("encyclopedia:index")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        util.save_entry("Django", "A framework.")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class RevisionTests(WikiTestCase):
+    def save(self, title, content, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return revisions.save_revision(title, content, **kwargs)
+
+    def test_history_round_trips_past_snapshots(self):
+        texts = [f"# Page\n\nline {n}\n" + "unchanged\n" * 5 for n in range(45)]
+        for n, text in enumerate(texts, 1):
+            self.assertEqual(self.save("Page", text, base=n - 1), n)
+        self.assertEqual(Revision.objects.filter(title="Page", snapshot=True).count(), 3)
+        for n in (1, 20, 21, 33, 45):
+            self.assertEqual(revisions.get_revision("Page", n), texts[n - 1])
+        self.assertEqual(util.get_entry("Page"), texts[-1])
+
+    def test_entry_is_written_only_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            revisions.save_revision("Page", "draft")
+            self.assertIsNone(util.get_entry("Page"))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(util.get_entry("Page"), "draft")
+
+    def test_stale_base_is_rejected(self):
+        self.save("Page", "first")
+        self.save("Page", "second", base=1)
+        with self.assertRaises(revisions.EditConflict) as cm:
+            self.save("Page", "third", base=1)
+        self.assertEqual(cm.exception.current, 2)
+        self.assertEqual(util.get_entry("Page"), "second")
+
+    def test_losing_a_race_leaves_the_entry_alone(self):
+        self.save("Page", "first")
+        self.save("Page", "winner", base=1)
+        # This save read the current revision before the winner committed
+        real = revisions.current_revision
+        with mock.patch.object(revisions, "current_revision", side_effect=[1, real("Page")]):
+            with self.assertRaises(revisions.EditConflict):
+                self.save("Page", "loser")
+        self.assertEqual(util.get_entry("Page"), "winner")
+        self.assertEqual(revisions.get_revision("Page", 2), "winner")
+
+    def test_late_write_of_an_older_revision_is_repaired(self):
+        self.save("Page", "first")
+        self.save("Page", "second", base=1)
+        revisions._write_entry("Page", 1, "first")
+        self.assertEqual(util.get_entry("Page"), "second")
+
+    def test_create_fails_if_the_page_exists(self):
+        self.save("Page", "mine", create=True)
+        with self.assertRaises(revisions.EditConflict):
+            self.save("Page", "theirs", create=True)
+        self.write_file("Legacy", "no history yet")
+        with self.assertRaises(revisions.EditConflict):
+            self.save("Legacy", "theirs", create=True)
+        self.assertEqual(util.get_entry("Page"), "mine")
+
+    def test_concurrent_create_view(self):
+        self.save("Page", "mine", create=True)
+        # find_entry hasn't seen the other request's page yet
+        with mock.patch.object(util, "find_entry", return_value=None):
+            response = self.client.post(reverse("encyclopedia:create"), {"title": "Page", "content": "theirs"})
+        self.assertContains(response, "already exists")
+        self.assertEqual(util.get_entry("Page"), "mine")
+
+
+class LinkGraphTests(WikiTestCase):
+    def test_links_follow_edits(self):
+        util.save_entry("Django", "Written in [Python](/wiki/Python/), see [HTML](/wiki/HTML).")
+        util.save_entry("Flask", "Also [Python](/wiki/Python).")
+        self.assertEqual(links.outgoing("Django"), ["HTML", "Python"])
+        self.assertEqual(links.backlinks("Python"), ["Django", "Flask"])
+        digest = links.backlinks_digest("Python")
+
+        util.save_entry("Django", "Written in [HTML](/wiki/HTML).")
+        self.assertEqual(links.backlinks("Python"), ["Flask"])
+        self.assertNotEqual(links.backlinks_digest("Python"), digest)
+
+        response = self.client.get(reverse("encyclopedia:entry_links", kwargs={"title": "HTML"}))
+        self.assertEqual(response.json(), {"title": "HTML", "outgoing": [], "backlinks": ["Django"]})
+
+
+    @override_settings(ALLOWED_HOSTS=["wiki.example.com"])
+    def test_only_links_to_this_site_count(self):
+        content = ("[Python](https://en.wikipedia.org/wiki/Python), [CSS](https://wiki.example.com/wiki/CSS), "
+                   "<https://en.wikipedia.org/wiki/Git>, </wiki/Django/> and [HTML][html].\n\n"
+                   "[html]: /wiki/HTML\n")
+        self.assertEqual(links.outgoing_titles("Page", content), {"CSS", "Django", "HTML"})
+
+    def test_code_is_not_a_link(self):
+        content = ("Write `/wiki/HTML` or `[x](/wiki/CSS)`, see [Git](/wiki/Git).\n\n"
+                   "```\n[Python](/wiki/Python)\n```\n")
+        self.assertEqual(links.outgoing_titles("Page", content), {"Git"})
+
+class RendererTests(WikiTestCase):
+    def test_available_renderers_render_headings(self):
+        self.assertIn("markdown2", renderers.available_renderers())
+        for name in renderers.available_renderers():
+            self.assertIn("Title</h1>", renderers.get_renderer(name)("# Title\n"), name)
+
+    def test_unknown_renderer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            renderers.get_renderer("nope")
+
+    def test_benchmark_renderers(self):
+        self.write_file("Page", "# Title\n\nSome *text*.")
+        path = os.path.join(self.root, "results.json")
+        call_command("benchmark_renderers", "--engines", "markdown2", "--repeat", "1",
+                     "--output", path, stdout=io.StringIO())
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertEqual(results["entries"], 1)
+        self.assertEqual(list(results["renderers"]), ["markdown2"])
+        with self.assertRaises(CommandError):
+            call_command("benchmark_renderers", "--engines", "nope", stdout=io.StringIO())
+
+    def test_benchmark_wiki(self):
+        path = os.path.join(self.root, "results.json")
+        command = "encyclopedia.management.commands.benchmark_wiki"
+        # The command sets up its own test database, which this test already has
+        with mock.patch(f"{command}.setup_test_environment"), mock.patch(f"{command}.teardown_test_environment"), \
+                mock.patch(f"{command}.connection.creation.create_test_db"), \
+                mock.patch(f"{command}.connection.creation.destroy_test_db"):
+            call_command("benchmark_wiki", "--sizes", "5", "--requests", "2", "--output", path,
+                         stdout=io.StringIO())
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)
+        self.assertEqual(set(results["sizes"]["5"]), {"index", "search", "entry_page", "random_page", "save_edit"})
+        # The generated corpus stays in its temporary directory
+        self.assertFalse(os.path.exists(settings.WIKI_CATALOG_PATH))
+
+    def test_renderer_setting_invalidates_the_cache(self):
+        util.save_entry("Page", "# Title")
+        render_cache.rendered_entry("Page")
+        with self.settings(WIKI_MARKDOWN_RENDERER="nope"):
+            with self.assertRaises(ImproperlyConfigured):
+                render_cache.rendered_entry("Page")
+
+
+class ImportEntriesTests(WikiTestCase):
+    def import_entries(self, records, *args):
+        path = os.path.join(self.root, "import.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for title, content in records:
+                f.write(json.dumps({"title": title, "content": content}) + "\n")
+        call_command("import_entries", path, *args, stdout=io.StringIO())
+
+    def test_import_records_revisions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            revisions.save_revision("Python", "old")
+        self.import_entries([("Python", "new"), ("Git", "A VCS.")], "--batch-size", "1")
+        self.assertEqual(util.get_entry("Python"), "new")
+        self.assertEqual(revisions.current_revision("Python"), 2)
+        self.assertEqual(revisions.get_revision("Python", 1), "old")
+        self.assertEqual(revisions.get_revision("Git", 1), "A VCS.")
+
+    def test_skip_existing_keeps_the_first_duplicate(self):
+        self.write_file("Python", "on disk")
+        self.import_entries([("Python", "imported"), ("Git", "first"), ("git", "second"), ("Git", "third")],
+                            "--skip-existing", "--batch-size", "2")
+        self.assertEqual(util.get_entry("Python"), "on disk")
+        self.assertEqual(util.get_entry("Git"), "first")
+        self.assertEqual(util.list_entries(), ("Git", "Python"))
+        self.assertEqual(revisions.current_revision("Git"), 1)
+
+
+    def test_tar_gz_round_trip(self):
+        entries = {"Python": "# Python\n\nA language.", "Café": "Ünïcode *content*."}
+        for title, content in entries.items():
+            self.write_file(title, content)
+        path = os.path.join(self.root, "entries.tar.gz")
+        call_command("export_entries", path, stdout=io.StringIO(), stderr=io.StringIO())
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+
+        for title in entries:
+            os.remove(os.path.join(self.root, "entries", f"{title}.md"))
+        call_command("import_entries", path, stdout=io.StringIO())
+        self.assertEqual(set(util.list_entries()), set(entries))
+        for title, content in entries.items():
+            self.assertEqual(util.get_entry(title), content)
+
+class ExportStaticTests(WikiTestCase):
+    def export(self):
+        out = io.StringIO()
+        call_command("export_static", os.path.join(self.root, "site"), "--workers", "1", stdout=out)
+        return out.getvalue()
+
+    def test_renderer_change_rerenders(self):
+        self.write_file("Python", "# Python")
+        self.write_file("Django", "# Django")
+        self.assertIn("2 rendered", self.export())
+        self.assertIn("0 rendered", self.export())
+        with self.settings(WIKI_MARKDOWN_RENDERER="markdown"):
+            self.assertIn("2 rendered", self.export())
+
+    def test_index_links_stay_in_the_export(self):
+        for title in ["Python", "Perl", "Django"]:
+            self.write_file(title, "")
+        self.export()
+        with open(os.path.join(self.root, "site", "index.html"), encoding="utf-8") as f:
+            page = f.read()
+        self.assertNotIn("?all=1", page)
+        self.assertNotIn("?start=", page)
+        for initial in "DP":
+            self.assertIn(f'href="#initial-{initial}"', page)
+            self.assertEqual(page.count(f'id="initial-{initial}"'), 1)
+
+
+class SQLiteBackendTests(WikiTestCase):
+    def test_full_text_search(self):
+        with self.settings(WIKI_ENTRY_BACKEND="sqlite"):
+            util.save_entry("Python", "A programming language with indentation.")
+            util.save_entry("Django", "A web framework written in Python.")
+            self.assertEqual(search_index.search("python"), ["Python", "Django"])
+            self.assertEqual(search_index.search("framework"), ["Django"])
+            util.save_entry("Django", "A web framework.")
+            self.assertEqual(search_index.search("python"), ["Python"])
+            self.assertEqual(util.list_entries(), ("Django", "Python"))
+
+    def test_migrate_to_default_path(self):
+        self.write_file("Python", "A language.")
+        with self.settings(BASE_DIR=self.root):
+            del settings.WIKI_SQLITE_PATH
+            call_command("migrate_entries_to_sqlite", stdout=io.StringIO())
+        target = SQLiteEntryStorage(os.path.join(self.root, "entries.sqlite3"))
+        self.assertEqual(target.read("Python"), "A language.")
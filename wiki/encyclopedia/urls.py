@@ -7,7 +7,9 @@ app_name = "encyclopedia"
 urlpatterns = [
     path("", views.index, name="index"),
     path("wiki/<str:title>/", views.entry_page, name="entry"),
+    path("wiki/<str:title>/links/", views.entry_links, name="entry_links"),
     path("search/", views.search, name="search"),
+    path("autocomplete/", views.autocomplete, name="autocomplete"),
     path("create/", views.create_page, name="create"),
     path("edit/<str:title>/", views.edit_page, name="edit"),
     path("save_edit/<str:title>/", views.save_edit, name="save_edit"),
@@ -1,16 +1,65 @@
-import re
+import hashlib
+import threading
+from datetime import datetime, timezone
 
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .catalog import catalog
+from .signals import STORAGE_SETTINGS, entries_saved, entry_saved
+from .storage import get_backend
 
 
 def list_entries():
     """
-    Returns a list of all names of encyclopedia entries.
+    Returns a sorted tuple of all names of encyclopedia entries.
+    """
+    return catalog.all()
+
+
+def page_entries(after=None, start=None, limit=200):
+    """
+    Returns a page of entry names in sorted order, and whether there
+    are more. See TitleCatalog.page.
+    """
+    return catalog.page(after=after, start=start, limit=limit)
+
+
+def entry_initials():
+    """
+    Returns (initial, number of entries) pairs for the index's
+    alphabetical navigation. Initials are case-folded and upper-cased.
+    """
+    return catalog.initials()
+
+
+def find_entry(title):
+    """
+    Returns the name of the entry matching `title` regardless of case,
+    or None if there is no such entry.
+    """
+    return catalog.lookup(title)
+
+
+def entries_starting_with(prefix, limit=50):
+    """
+    Returns up to `limit` entry names starting with `prefix`, ignoring case.
+    """
+    return catalog.prefixed(prefix, limit)
+
+
+def entries_containing(text, limit=50):
+    """
+    Returns up to `limit` entry names containing `text`, ignoring case.
+    """
+    return catalog.containing(text, limit)
+
+
+def random_entry():
+    """
+    Returns the name of a random entry, or None if there are none.
     """
-    _, filenames = default_storage.listdir("entries")
-    return list(sorted(re.sub(r"\.md$", "", filename)
-                for filename in filenames if filename.endswith(".md")))
+    return catalog.choice()
 
 
 def save_entry(title, content):
@@ -19,10 +68,29 @@ def save_entry(title, content):
     content. If an existing entry with the same title already exists,
     it is replaced.
     """
-    filename = f"entries/{title}.md"
-    if default_storage.exists(filename):
-        default_storage.delete(filename)
-    default_storage.save(filename, ContentFile(content))
+    get_backend().write(title, content)
+    _remember_digest(title, content)
+    entry_saved.send(sender=save_entry, title=title, content=content)
+
+
+def save_entries(entries):
+    """
+    Saves a batch of (title, content) pairs without notifying caches and
+    indexes, and returns the titles. Call entries_changed() with all the
+    titles once the last batch is written.
+    """
+    entries = list(entries)
+    get_backend().write_many(entries)
+    for title, content in entries:
+        _remember_digest(title, content)
+    return [title for title, _ in entries]
+
+
+def entries_changed(titles):
+    """
+    Brings caches and indexes up to date after save_entries().
+    """
+    entries_saved.send(sender=save_entries, titles=list(titles))
 
 
 def get_entry(title):
@@ -30,8 +98,82 @@ def get_entry(title):
     Retrieves an encyclopedia entry by its title. If no such
     entry exists, the function returns None.
     """
-    try:
-        f = default_storage.open(f"entries/{title}.md")
-        return f.read().decode("utf-8")
-    except FileNotFoundError:
+    return get_backend().read(title)
+
+
+def content_digest(content):
+    """
+    Returns a hex digest identifying an entry's Markdown content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# title -> ((mtime, size), digest), so that digests can be answered from
+# entry metadata without reading the entry again
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _entry_stat(title):
+    return get_backend().stat(title)
+
+
+def _remember_digest(title, content):
+    stat = _entry_stat(title)
+    if stat is not None:
+        with _digests_lock:
+            _digests[title] = (stat, content_digest(content))
+
+
+def entry_digest(title):
+    """
+    Returns the content digest of an entry, or None if it does not exist.
+    The entry is only read when its mtime or size changed since the last
+    call.
+    """
+    stat = _entry_stat(title)
+    if stat is None:
+        return None
+    with _digests_lock:
+        cached = _digests.get(title)
+    if cached is not None and cached[0] == stat:
+        return cached[1]
+    content = get_entry(title)
+    if content is None:
         return None
+    digest = content_digest(content)
+    with _digests_lock:
+        _digests[title] = (stat, digest)
+    return digest
+
+
+def entry_modified(title):
+    """
+    Returns when an entry was last written, or None if it does not exist.
+    """
+    stat = _entry_stat(title)
+    return stat[0] if stat is not None else None
+
+
+def entries_etag():
+    """
+    Returns a value that changes whenever the list of entries changes.
+    """
+    return catalog.etag()
+
+
+def entries_modified():
+    """
+    Returns when the list of entries last changed, or None if unknown.
+    """
+    timestamp = catalog.last_modified()
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+@receiver(setting_changed)
+def reset_digests(setting, **kwargs):
+    if setting in STORAGE_SETTINGS:
+        with _digests_lock:
+            _digests.clear()
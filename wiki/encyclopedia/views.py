@@ -1,16 +1,30 @@
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django import forms
-from django.http import HttpResponseRedirect
-import markdown2
-import random
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.views.decorators.http import condition
+
+from . import links, renderers, revisions, util
+from .render_cache import rendered_entry
+from . import search_index
+from .suggest import suggester
+
+INDEX_PAGE_SIZE = 200
+
+# Rows of the streamed index are sent in chunks of this many titles
+STREAM_CHUNK_SIZE = 500
+
+STREAM_MARKER = "<!-- entries -->"
 
-from . import util
 
 class SearchForm(forms.Form):
     q = forms.CharField(label="", widget=forms.TextInput(attrs={
         "placeholder": "Search Encyclopedia...",
-        "class": "form-control"
+        "class": "form-control",
+        "autocomplete": "off",
+        "list": "search-suggestions",
     }))
 
 class CreateForm(forms.Form):
@@ -23,39 +37,112 @@ class CreateForm(forms.Form):
 
 class EditForm(forms.Form):
     content = forms.CharField(label="Content (Markdown)", widget=forms.Textarea(attrs={"class": "form-control","rows":10}))
+    revision = forms.IntegerField(widget=forms.HiddenInput, min_value=0)
+
+
+def _index_etag(request):
+    return util.entries_etag()
+
+
+def _index_last_modified(request):
+    return util.entries_modified()
+
+
+def _entry_etag(request, title):
+    # The page also lists backlinks, which change when other entries do,
+    # and its HTML depends on the renderer
+    digest = util.entry_digest(title)
+    if digest is None:
+        return None
+    return f"{digest}-{links.backlinks_digest(title)}-{renderers.renderer_name()}"
 
 
+@condition(etag_func=_index_etag, last_modified_func=_index_last_modified)
 def index(request):
+    """
+    One page of titles, starting after ?after=<title> or at ?start=<letter>.
+    ?all=1 streams the full listing instead.
+    """
+    if request.GET.get("all"):
+        return StreamingHttpResponse(_stream_index(request))
+
+    after = request.GET.get("after")
+    start = request.GET.get("start")
+    entries, has_more = util.page_entries(after=after, start=start, limit=INDEX_PAGE_SIZE)
     return render(request, "encyclopedia/index.html", {
-        "entries": util.list_entries(),
+        "entries": entries,
+        "next_after": entries[-1] if has_more else None,
+        "initials": util.entry_initials(),
         "search_form": SearchForm(),
     })
 
+
+def _stream_index(request):
+    """
+    Yields the index page with every title, so the first byte goes out
+    before the listing is built and memory doesn't grow with it.
+    """
+    page = render_to_string("encyclopedia/index.html", {
+        "streaming": True,
+        "initials": util.entry_initials(),
+        "search_form": SearchForm(),
+    }, request)
+    head, tail = page.split(STREAM_MARKER, 1)
+    yield head
+
+    after = None
+    while True:
+        entries, has_more = util.page_entries(after=after, limit=STREAM_CHUNK_SIZE)
+        yield "".join(
+            format_html('<a href="{}" class="list-group-item list-group-item-action">{}</a>\n',
+                        reverse("encyclopedia:entry", kwargs={"title": entry}), entry)
+            for entry in entries
+        )
+        if not has_more:
+            break
+        after = entries[-1]
+    yield tail
+
+
+# No Last-Modified: the entry's mtime doesn't change when its backlinks or
+# the renderer do, so If-Modified-Since could answer 304 for a stale page
+@condition(etag_func=_entry_etag)
 def entry_page(request, title):
     """
-    Converts Markdown -> HTML
+    Converts Markdown -> HTML (cached, see render_cache)
     """
-    entry_md = util.get_entry(title)
+    entry_html = rendered_entry(title)
     search_form = SearchForm()
 
-    if entry_md is None:
+    if entry_html is None:
         return render(request, "encyclopedia/error.html", {
             "message": f"The page '{title}' was not found.",
             "search_form": search_form
         })
-    # convert Markdown to HTML
-    entry_html = markdown2.markdown(entry_md)
     return render(request, "encyclopedia/entry.html", {
         "title": title,
         "content": entry_html,
+        "backlinks": links.backlinks(title),
         "search_form": search_form
     })
+
+
+def entry_links(request, title):
+    """
+    JSON: the entries `title` links to and the entries linking to it
+    """
+    return JsonResponse({
+        "title": title,
+        "outgoing": links.outgoing(title),
+        "backlinks": links.backlinks(title),
+    })
     
     
 def search(request):
     """
     If exact match -> redirect to that page.
-    Otherwise -> show search results
+    Otherwise -> show ranked full-text results, then titles starting with the query,
+    or failing both, titles containing it
     """
     if request.method != "GET":
         return redirect(reverse("encyclopedia:index"))
@@ -68,12 +155,15 @@ def search(request):
     if not query:
         return redirect(reverse("encyclopedia:index"))
 
-    entries = util.list_entries()
-    for e in entries:
-        if e.lower() == query.lower():
-            return redirect(reverse("encyclopedia:entry", kwargs={"title": e}))
+    match = util.find_entry(query)
+    if match is not None:
+        return redirect(reverse("encyclopedia:entry", kwargs={"title": match}))
 
-    results = [e for e in entries if query.lower() in e.lower()]
+    results = search_index.search(query)
+    ranked = set(results)
+    results += [e for e in util.entries_starting_with(query) if e not in ranked]
+    if not results:
+        results = util.entries_containing(query)
 
     return render(request, "encyclopedia/search.html", {
         "query": query,
@@ -82,6 +172,17 @@ def search(request):
     })
     
     
+def autocomplete(request):
+    """
+    JSON title suggestions for the search box: ?q=<partial title>
+    """
+    query = request.GET.get("q", "")
+    return JsonResponse({
+        "query": query,
+        "suggestions": suggester.suggest(query),
+    })
+
+
 def create_page(request):
     """
     GET -> show empty create form
@@ -94,14 +195,18 @@ def create_page(request):
             title = form.cleaned_data["title"].strip()
             content = form.cleaned_data["content"]
 
-            entries = util.list_entries()
-            for e in entries:
-                if e.lower() == title.lower():
-                    return render(request, "encyclopedia/error.html", {
-                        "message": f"A page with the title '{title}' already exists.",
-                        "search_form": search_form
-                    })
-            util.save_entry(title, content)
+            exists = util.find_entry(title) is not None
+            if not exists:
+                try:
+                    # Fails if another request created the page meanwhile
+                    revisions.save_revision(title, content, create=True)
+                except revisions.EditConflict:
+                    exists = True
+            if exists:
+                return render(request, "encyclopedia/error.html", {
+                    "message": f"A page with the title '{title}' already exists.",
+                    "search_form": search_form
+                })
             return redirect(reverse("encyclopedia:entry", kwargs={"title": title}))
     else:
         form = CreateForm()
@@ -125,8 +230,11 @@ def edit_page(request, title):
             "message": "Page not found."
         })
 
-    # Pre-fill the form with existing content
-    form = EditForm(initial={"content": content})
+    # Pre-fill the form with existing content and the revision it came from
+    form = EditForm(initial={
+        "content": content,
+        "revision": revisions.current_revision(title),
+    })
     search_form = SearchForm()
 
     return render(request, "encyclopedia/edit.html", {
@@ -154,17 +262,27 @@ def save_edit(request, title):
         })
 
     content = form.cleaned_data["content"]
-    # Overwrite existing entry
-    util.save_entry(title, content)
+    try:
+        # Only overwrite the entry if nobody saved it since the form was loaded
+        revisions.save_revision(title, content, base=form.cleaned_data["revision"])
+    except revisions.EditConflict as e:
+        form = EditForm(initial={"content": content, "revision": e.current})
+        return render(request, "encyclopedia/edit.html", {
+            "title": title,
+            "form": form,
+            "message": "Someone else edited this page while you were editing. "
+                       "Review the current version and save again.",
+            "current": util.get_entry(title),
+            "search_form": search_form
+        })
     return redirect(reverse("encyclopedia:entry", kwargs={"title": title}))
 
 
 def random_page(request):
-    entries = util.list_entries()
-    if not entries:
+    choice = util.random_entry()
+    if choice is None:
         return render(request, "encyclopedia/error.html", {
             "message": "No encyclopedia entries available.",
             "search_form": SearchForm()
         })
-    choice = random.choice(entries)
     return redirect(reverse("encyclopedia:entry", kwargs={"title": choice}))
@@ -119,3 +119,39 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Rendered entry cache
+# WIKI_RENDER_CACHE_SIZE caps the in-process LRU (number of pages).
+# WIKI_RENDER_CACHE_ALIAS optionally names an entry in CACHES that is
+# shared between processes, e.g. a Memcached or Redis cache.
+
+WIKI_RENDER_CACHE_SIZE = 512
+
+WIKI_RENDER_CACHE_ALIAS = None
+
+
+# Full-text search index (snapshot + journal), see encyclopedia/search_index.py
+
+WIKI_SEARCH_INDEX_DIR = os.path.join(BASE_DIR, 'search_index')
+
+
+# Entry storage backend: "file" (entries/*.md) or "sqlite" (a single
+# database with an FTS5 index, see encyclopedia/storage.py). Move existing
+# files over with `python manage.py migrate_entries_to_sqlite`.
+
+WIKI_ENTRY_BACKEND = 'file'
+
+WIKI_SQLITE_PATH = os.path.join(BASE_DIR, 'entries.sqlite3')
+
+# The list of entry titles, saved so a restart doesn't have to list every
+# entry again (see encyclopedia/catalog.py)
+
+WIKI_CATALOG_PATH = os.path.join(BASE_DIR, 'catalog.json')
+
+
+# Markdown renderer for entries: "markdown2", "markdown", "mistune",
+# "commonmark" or "markdown-it" (see encyclopedia/renderers.py). Compare
+# them on your entries with `python manage.py benchmark_renderers`.
+
+WIKI_MARKDOWN_RENDERER = 'markdown2'